@@ -205,6 +205,7 @@ Ctrl+S = Save Code"""
             pady=10,
         )
         self.code_text.pack(fill=tk.BOTH, expand=True)
+        self._install_text_stats()
 
         placeholder = """# Welcome to Python Learning Platform!
 #
@@ -272,6 +273,7 @@ print(\"Hello, Python!\")
             ("Explain", self.explain_code, "#00BCD4"),
             ("Roadmap", self.open_roadmap, "#2196F3"),
             ("Save", self.save_code, "#4CAF50"),
+            ("Save Log", self.save_output_log, "#607D8B"),
         ]
 
         for i, (text, command, color) in enumerate(tools_config):
@@ -375,16 +377,89 @@ print(\"Hello, Python!\")
 
         self.update_cursor_position()
 
-    def update_cursor_position(self, event=None):
-        del event
-        cursor_pos = self.code_text.index(tk.INSERT)
-        line, col = cursor_pos.split(".")
+    def _install_text_stats(self):
+        """Track editor line/char counts from the Tk insert/delete commands.
+
+        The widget command is renamed and proxied so every modification
+        adjusts the counters by the size of the edit instead of re-reading
+        the whole buffer.
+        """
+        self._stats_lines = 1
+        self._stats_chars = 0
+        self._status_after_id = None
+
+        widget = self.code_text._w
+        self._code_text_orig = widget + "_orig"
+        self.root.tk.call("rename", widget, self._code_text_orig)
+        self.root.tk.createcommand(widget, self._code_text_proxy)
+
+    def _code_text_proxy(self, *args):
+        call = self.root.tk.call
+        orig = self._code_text_orig
+        op = args[0] if args else ""
+
+        if op == "insert":
+            result = call((orig,) + args)
+            self._count_inserted(args[2::2])
+        elif op == "delete" and len(args) <= 3:
+            removed = self._range_text(args[1], args[2] if len(args) > 2 else None)
+            result = call((orig,) + args)
+            self._count_removed(removed)
+        elif op == "replace":
+            removed = self._range_text(args[1], args[2])
+            result = call((orig,) + args)
+            self._count_removed(removed)
+            self._count_inserted(args[3::2])
+        elif op == "delete" or (op == "edit" and len(args) > 1 and args[1] in ("undo", "redo")):
+            result = call((orig,) + args)
+            self._recount_text_stats()
+        else:
+            return call((orig,) + args)
+
+        self._schedule_status_update()
+        return result
+
+    def _range_text(self, index1, index2=None):
+        """Return the text a delete of index1..index2 would actually remove."""
+        call = self.root.tk.call
+        orig = self._code_text_orig
+        if index2 is None:
+            index2 = f"{index1} + 1 chars"
+        if call(orig, "compare", index2, ">", "end - 1 chars"):
+            index2 = "end - 1 chars"
+        return call(orig, "get", index1, index2)
+
+    def _count_inserted(self, chunks):
+        for chunk in chunks:
+            chunk = str(chunk)
+            self._stats_chars += len(chunk)
+            self._stats_lines += chunk.count("\n")
+
+    def _count_removed(self, text):
+        text = str(text)
+        self._stats_chars -= len(text)
+        self._stats_lines -= text.count("\n")
+
+    def _recount_text_stats(self):
+        chars, lines = self.root.tk.call(
+            self._code_text_orig, "count", "-chars", "-lines", "1.0", "end - 1 chars"
+        )
+        self._stats_chars = int(chars)
+        self._stats_lines = int(lines) + 1
+
+    def _schedule_status_update(self):
+        if self._status_after_id is None:
+            self._status_after_id = self.root.after_idle(self._flush_status_update)
+
+    def _flush_status_update(self):
+        self._status_after_id = None
+        line, col = self.code_text.index(tk.INSERT).split(".")
         self.line_indicator.config(text=f"Line {line}, Col {int(col)+1}")
+        self.stats_label.config(text=f"Lines: {self._stats_lines} | Chars: {self._stats_chars}")
 
-        content = self.code_text.get("1.0", tk.END)
-        lines = content.count("\n")
-        chars = len(content) - 1
-        self.stats_label.config(text=f"Lines: {lines} | Chars: {chars}")
+    def update_cursor_position(self, event=None):
+        del event
+        self._schedule_status_update()
 
     def show_welcome_message(self):
         self.log_output("=" * 60 + "\n")
@@ -407,6 +482,7 @@ print(\"Hello, Python!\")
         self.log_output("Executing code...\n")
         self.log_output("=" * 60 + "\n")
         self.status_label.config(text="Running code...")
+        self.output_console().flush()
         self.root.update()
 
         result = run_code(code, auto_confirm=True)
@@ -424,7 +500,7 @@ print(\"Hello, Python!\")
             self.status_label.config(text="Error occurred")
 
     def clear_output(self):
-        self.output_text.delete("1.0", tk.END)
+        self.output_console().clear()
         self.log_output("Output cleared.\n")
         self.status_label.config(text="Output cleared")
 
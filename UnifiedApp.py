@@ -2,6 +2,8 @@ import ast
 import contextlib
 import io
 import os
+import shutil
+import tempfile
 import traceback
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, ttk
@@ -95,12 +97,79 @@ def suggest_improvements(code: str) -> str:
     return "\n".join(f"- {s}" for s in suggestions)
 
 
+class OutputConsole:
+    """Batched, bounded writer for an output Text widget.
+
+    Writes are queued and flushed once per UI frame. The widget only keeps
+    the last ``max_lines`` lines; the full log is spooled to a temporary
+    file so it can still be saved with ``save``.
+    """
+
+    FRAME_MS = 16
+
+    def __init__(self, widget: tk.Text, max_lines: int = 5000):
+        self.widget = widget
+        self.max_lines = max_lines
+        self._pending: list[str] = []
+        self._after_id = None
+        self._spool = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+", encoding="utf-8")
+
+    def write(self, text: str):
+        if not text:
+            return
+        self._pending.append(text)
+        self._spool.write(text)
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.FRAME_MS, self.flush)
+
+    def flush(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if not self._pending:
+            return
+        text = self._tail("".join(self._pending))
+        self._pending.clear()
+
+        self.widget.insert(tk.END, text)
+        excess = int(self.widget.index("end-1c").split(".")[0]) - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+        self.widget.see(tk.END)
+
+    def _tail(self, text: str) -> str:
+        """Drop everything but the last ``max_lines`` lines before touching Tk."""
+        cut = len(text)
+        for _ in range(self.max_lines):
+            cut = text.rfind("\n", 0, cut)
+            if cut < 0:
+                return text
+        return text[cut + 1:]
+
+    def clear(self):
+        self._pending.clear()
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self.widget.delete("1.0", tk.END)
+        self._spool.seek(0)
+        self._spool.truncate()
+
+    def save(self, filename: str):
+        self._spool.flush()
+        self._spool.seek(0)
+        with open(filename, "w", encoding="utf-8") as handle:
+            shutil.copyfileobj(self._spool, handle)
+        self._spool.seek(0, os.SEEK_END)
+
+
 class UnifiedAppGUI:
     """Base desktop app with helper methods for derived UIs."""
 
     def __init__(self, root: tk.Tk):
         self.root = root
         self.root.configure(bg="#f5f5f5")
+        self.console = None
         self.create_main_layout()
 
     def create_main_layout(self):
@@ -117,12 +186,18 @@ class UnifiedAppGUI:
         btn = tk.Button(frame, text="Run", command=self.execute_code)
         btn.pack(pady=8)
 
+        tk.Button(frame, text="Save Log", command=self.save_output_log).pack(pady=(0, 8))
+
         self.status_label = tk.Label(frame, text="Ready", anchor=tk.W)
         self.status_label.pack(fill=tk.X, padx=12, pady=6)
 
+    def output_console(self) -> OutputConsole:
+        if self.console is None:
+            self.console = OutputConsole(self.output_text)
+        return self.console
+
     def log_output(self, text: str):
-        self.output_text.insert(tk.END, text)
-        self.output_text.see(tk.END)
+        self.output_console().write(text)
 
     def insert_tab(self, event):
         self.code_text.insert(tk.INSERT, "    ")
@@ -136,7 +211,7 @@ class UnifiedAppGUI:
         self.log_output(run_code(code))
 
     def clear_output(self):
-        self.output_text.delete("1.0", tk.END)
+        self.output_console().clear()
 
     def lint_code(self):
         code = self.code_text.get("1.0", tk.END)
@@ -167,3 +242,13 @@ class UnifiedAppGUI:
         with open(filename, "w", encoding="utf-8") as handle:
             handle.write(self.code_text.get("1.0", tk.END))
         self.log_output(f"Saved: {filename}\n")
+
+    def save_output_log(self):
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".log",
+            filetypes=[("Log files", "*.log"), ("Text files", "*.txt"), ("All files", "*.*")],
+        )
+        if not filename:
+            return
+        self.output_console().save(filename)
+        self.log_output(f"Saved full log: {filename}\n")
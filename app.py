@@ -1,15 +1,43 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, g, Response
+from flask import before_render_template, template_rendered
 from flask_wtf.csrf import CSRFProtect
+from flask_sock import Sock, ConnectionClosed
+from urllib.parse import urlparse
+from contextlib import nullcontext
+import json
 import sys
-from io import StringIO
-import contextlib
+import time
 import traceback
 import secrets
+import executor
+import metrics
+import sessions
+import usage
+import tracing
 from progress import mark_complete, get_completed, get_progress, is_complete, get_all_progress
+from sandbox import MAX_CODE_LENGTH, CancelToken
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(32)  # Generate secure secret key
 csrf = CSRFProtect(app)
+sock = Sock(app)
+
+HTTP_REQUEST_SECONDS = metrics.Histogram(
+    'aca_http_request_duration_seconds', 'Request latency by route template', ('method', 'route')
+)
+HTTP_REQUESTS = metrics.Counter(
+    'aca_http_requests_total', 'Requests by route template and status', ('method', 'route', 'status')
+)
+EXECUTE_OUTCOMES = metrics.Counter(
+    'aca_execute_outcomes_total', 'Code executions by outcome', ('outcome',),
+    initial=[('success',), ('exception',), ('timeout',), ('truncated',), ('cancelled',)]
+)
+EXECUTE_SECONDS = metrics.Histogram('aca_execute_duration_seconds', 'Time spent running submitted code')
+EXECUTE_STARTED = metrics.Counter('aca_execute_started_total', 'Code executions started')
+metrics.Gauge(
+    'aca_execute_in_flight', 'Code executions currently running',
+    lambda: EXECUTE_STARTED.value() - sum(EXECUTE_OUTCOMES.collect().values())
+)
 
 # Comprehensive Learning Paths - Integrated from UnifiedApp_Modern.py
 LEARNING_PATHS = {
@@ -337,14 +365,23 @@ with open("example.txt", "r") as file:
     for line in file:
         print(f"Line: {line.strip()}")
 
+# notes.txt is already there for you to read
+with open("notes.txt", "r") as file:
+    print(file.readline().strip())
+
 # Try file operations:
 ''',
                 'hints': [
                     '"w" means write mode',
                     '"r" means read mode',
                     'with ensures file closes properly',
-                    '.strip() removes whitespace'
-                ]
+                    '.strip() removes whitespace',
+                    'Files only last for one run'
+                ],
+                # Seed files for the run's in-memory filesystem
+                'files': {
+                    'notes.txt': 'Files keep data between programs\nOpen them with open()\nClose them with with\n'
+                }
             },
             {
                 'id': 'classes_oop',
@@ -383,6 +420,45 @@ print(my_dog.birthday())
     }
 }
 
+def _route_label():
+    return request.url_rule.rule if request.url_rule else '<unmatched>'
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    g.trace = tracing.start_trace(f'{request.method} {_route_label()}', path=request.path)
+
+@app.after_request
+def _record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = _route_label()
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, route)
+        HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+    g.trace_status = response.status_code
+    return response
+
+@app.teardown_request
+def _end_request_trace(exc):
+    trace = g.pop('trace', None)
+    if trace is not None:
+        tracing.end_trace(trace, status=g.pop('trace_status', 500))
+
+@before_render_template.connect_via(app)
+def _start_template_span(sender, template, context, **extra):
+    g.setdefault('template_spans', []).append(tracing.start_span('template.render', template=template.name))
+
+@template_rendered.connect_via(app)
+def _end_template_span(sender, template, context, **extra):
+    spans = g.get('template_spans')
+    if spans:
+        tracing.end_span(spans.pop())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of request, execution and progress metrics"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     """Main landing page with all learning paths"""
@@ -406,73 +482,180 @@ def learning_path(path_id):
 @app.route('/lesson/<path_id>/<lesson_id>')
 def lesson_view(path_id, lesson_id):
     """Interactive lesson workspace"""
-    path = LEARNING_PATHS.get(path_id)
-    if path:
-        lesson = next((l for l in path['lessons'] if l['id'] == lesson_id), None)
-        if lesson:
-            is_completed = is_complete(path_id, lesson_id)
-            return render_template('lesson_view.html', path=path, lesson=lesson, is_completed=is_completed)
+    with tracing.span('lesson.lookup', path_id=path_id, lesson_id=lesson_id):
+        path = LEARNING_PATHS.get(path_id)
+        lesson = next((l for l in path['lessons'] if l['id'] == lesson_id), None) if path else None
+    if lesson:
+        is_completed = is_complete(path_id, lesson_id)
+        return render_template('lesson_view.html', path=path, lesson=lesson, is_completed=is_completed)
     return "Lesson not found", 404
 
 @app.route('/execute', methods=['POST'])
 @csrf.exempt  # Exempt this endpoint from CSRF for API testing
 def execute_code():
-    """Execute Python code safely and return output"""
+    """Execute Python code safely and return output
+
+    With "profile": true the response also carries a per-line and
+    per-function timing table; time limits apply either way. With
+    "path_id" and "lesson_id" the lesson's fixture files are readable
+    through open(). A "run_token" names the editor the run came from: a
+    newer run with the same token cancels this one, and so does the
+    client disconnecting. Lesson runs are scheduled ahead of playground
+    runs; learners over their soft daily quota are scheduled as batch
+    work, and over the hard quota their runs are refused.
+    """
     try:
         code = request.json.get('code', '')
+        profile = bool(request.json.get('profile', False))
+        files = _lesson_files(request.json.get('path_id'), request.json.get('lesson_id'))
+        run_token = request.json.get('run_token')
         
         # Validate code length
-        if len(code) > 10000:
-            return jsonify({'success': False, 'output': 'Error: Code too long (max 10000 characters)'})
-        
-        # Create a string buffer to capture output
-        output_buffer = StringIO()
-        
-        # Create restricted globals with safe builtins
-        safe_globals = {
-            '__builtins__': {
-                'print': print,
-                'range': range,
-                'len': len,
-                'str': str,
-                'int': int,
-                'float': float,
-                'bool': bool,
-                'list': list,
-                'dict': dict,
-                'tuple': tuple,
-                'set': set,
-                'abs': abs,
-                'max': max,
-                'min': min,
-                'sum': sum,
-                'sorted': sorted,
-                'enumerate': enumerate,
-                'zip': zip,
-            }
-        }
-        
-        # Redirect stdout to capture print statements
-        with contextlib.redirect_stdout(output_buffer):
-            # Execute the code with restricted globals
-            exec(code, safe_globals, {})
+        if len(code) > MAX_CODE_LENGTH:
+            return jsonify({'success': False, 'output': f'Error: Code too long (max {MAX_CODE_LENGTH} characters)'})
+
+        learner = _learner_id()
+        quota = usage.LEDGER.state(learner)
+        if quota == 'hard':
+            usage.QUOTA_REJECTIONS.inc()
+            return jsonify({'success': False, 'output': _quota_message()})
+        if quota == 'soft':
+            priority = 'batch'
+        else:
+            priority = 'interactive' if request.json.get('path_id') else 'playground'
         
-        output = output_buffer.getvalue()
-        return jsonify({'success': True, 'output': output or 'Code executed successfully'})
+        cancel = CancelToken()
+        client = request.environ.get('werkzeug.socket') or request.environ.get('gunicorn.socket')
+        EXECUTE_STARTED.inc()
+        outcome = 'exception'
+        start = time.perf_counter()
+        try:
+            with tracing.span('sandbox.run_code', profile=profile, backend=executor.get_backend().name) as run_span, \
+                    executor.RUNS.supersede((learner, str(run_token)), cancel) if run_token else nullcontext(), \
+                    executor.DISCONNECTS.watch(client, cancel) if client is not None else nullcontext():
+                result = executor.run(code, profile=profile, files=files, cancel=cancel, user=learner, priority=priority)
+                outcome = result.pop('outcome')
+                usage.LEDGER.record(learner, result.pop('usage', None))
+                if run_span:
+                    run_span.set(outcome=outcome)
+        finally:
+            EXECUTE_SECONDS.observe(time.perf_counter() - start)
+            EXECUTE_OUTCOMES.inc(outcome)
+        return jsonify(result)
     
     except Exception as e:
         error_output = traceback.format_exc()
         return jsonify({'success': False, 'output': error_output})
-    
-    finally:
-        if 'output_buffer' in locals():
-            output_buffer.close()
+
+def _quota_message():
+    return (f'Error: Daily compute quota used up ({usage.LEDGER.hard_seconds:g} CPU seconds '
+            f'per {usage.WINDOW_HOURS} hours). Try again later.')
+
+def _lesson_files(path_id, lesson_id):
+    """A lesson's fixture files, or None"""
+    path = LEARNING_PATHS.get(path_id)
+    lesson = next((l for l in path['lessons'] if l['id'] == lesson_id), None) if path else None
+    return lesson.get('files') if lesson else None
 
 @app.route('/playground')
 def playground():
     """Free-form code playground"""
+    _learner_id()  # so the session-mode WebSocket finds the same learner
     return render_template('playground.html')
 
+def _learner_id():
+    if 'learner_id' not in session:
+        session['learner_id'] = secrets.token_hex(8)
+    return session['learner_id']
+
+@app.route('/api/usage')
+def api_usage():
+    """The learner's compute use over the rolling day and their quota state"""
+    return jsonify(usage.LEDGER.summary(_learner_id()))
+
+@sock.route('/ws/session')
+def repl_session(ws):
+    """Session mode: run cells one at a time in the learner's live interpreter
+
+    Client messages: {"type": "run", "code"}, {"type": "notebook", "code"}
+    (the whole program, re-running only the cells an edit affects),
+    {"type": "stdin", "data"} or {"type": "eof"} (answering an "input"
+    message) and {"type": "reset"}. Server messages:
+    "ready", "input" (output so far; the cell waits on input()), "result"
+    and "error".
+    """
+    origin = request.headers.get('Origin')
+    if origin and urlparse(origin).netloc != request.host:
+        ws.send(json.dumps({'type': 'error', 'output': 'Error: Cross-origin session refused'}))
+        return
+    learner = _learner_id()
+    try:
+        repl = sessions.SESSIONS.open(learner)
+    except sessions.SessionLimitReached:
+        ws.send(json.dumps({'type': 'error', 'output': 'Error: All live sessions are in use, try again later'}))
+        return
+    ws.send(json.dumps({'type': 'ready', 'cells': repl.cells}))
+
+    def ask_input(output):
+        ws.send(json.dumps({'type': 'input', 'output': output}))
+        try:
+            while True:
+                raw = ws.receive(timeout=sessions.INPUT_TIMEOUT_SECONDS)
+                if raw is None:
+                    return None
+                reply = json.loads(raw)
+                if reply.get('type') == 'stdin':
+                    return str(reply.get('data', ''))
+                if reply.get('type') == 'eof':
+                    return None
+        except (ConnectionClosed, ValueError):
+            return None
+
+    while True:
+        try:
+            message = json.loads(ws.receive())
+        except ValueError:
+            continue
+        if message.get('type') not in ('reset', 'run', 'notebook'):
+            continue
+        # Ask the manager every time: the session may have been reaped
+        # while the connection sat idle
+        try:
+            repl = sessions.SESSIONS.open(learner)
+        except sessions.SessionLimitReached:
+            ws.send(json.dumps({'type': 'error', 'output': 'Error: All live sessions are in use, try again later'}))
+            continue
+        if message['type'] == 'reset':
+            repl.reset()
+            ws.send(json.dumps({'type': 'ready', 'cells': 0}))
+        else:
+            code = str(message.get('code', ''))
+            if len(code) > MAX_CODE_LENGTH:
+                ws.send(json.dumps({
+                    'type': 'result', 'success': False,
+                    'output': f'Error: Code too long (max {MAX_CODE_LENGTH} characters)',
+                }))
+                continue
+            if usage.LEDGER.state(learner) == 'hard':
+                usage.QUOTA_REJECTIONS.inc()
+                ws.send(json.dumps({'type': 'result', 'success': False, 'output': _quota_message()}))
+                continue
+            EXECUTE_STARTED.inc()
+            outcome = 'exception'
+            start = time.perf_counter()
+            try:
+                result = repl.run(code, ask_input, op=message['type'])
+                outcome = result.pop('outcome')
+                usage.LEDGER.record(learner, result.pop('usage', None))
+            except sessions.SessionClosed:
+                result = {'type': 'result', 'success': False,
+                          'output': 'Error: The session ended while idle, run the cell again'}
+            finally:
+                EXECUTE_SECONDS.observe(time.perf_counter() - start)
+                EXECUTE_OUTCOMES.inc(outcome)
+            result['cells'] = repl.cells
+            ws.send(json.dumps(result))
+
 @app.route('/mark-complete/<path_id>/<lesson_id>', methods=['POST'])
 @csrf.exempt
 def mark_lesson_complete(path_id, lesson_id):
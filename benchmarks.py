@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for the ACA Learning Platform
+Times the web app's hot paths and compares them against a saved baseline
+
+Usage:
+    python benchmarks.py --save bench_baseline.json
+    python benchmarks.py --compare bench_baseline.json --threshold 0.25
+    python benchmarks.py --throughput --backends inline,process,subinterpreter
+    python benchmarks.py --regrade 5000 --backends process
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import executor
+import progress
+import usage
+from app import app, LEARNING_PATHS
+
+# Lessons whose starter code is timed through /execute
+EXECUTE_LESSONS = [
+    ('fundamentals', 'hello_world'),
+    ('control_flow', 'for_loops'),
+    ('functions', 'functions_basics'),
+    ('advanced', 'dictionaries'),
+    ('advanced', 'classes_oop'),
+]
+
+
+def lesson_code(path_id, lesson_id):
+    """Starter code for a lesson"""
+    lessons = LEARNING_PATHS[path_id]['lessons']
+    return next(l['code'] for l in lessons if l['id'] == lesson_id)
+
+
+def build_progress_file(path, num_paths, lessons_per_path):
+    """Write a large progress file so progress I/O is measured at scale"""
+    data = {}
+    for path_id in LEARNING_PATHS:
+        data[path_id] = {
+            'completed': [l['id'] for l in LEARNING_PATHS[path_id]['lessons']],
+            'last_updated': datetime.now().isoformat()
+        }
+    for i in range(num_paths):
+        data[f'bench_path_{i}'] = {
+            'completed': [f'lesson_{j}' for j in range(lessons_per_path)],
+            'last_updated': datetime.now().isoformat()
+        }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def build_cases(client):
+    """Map of case name -> zero-argument callable doing one operation"""
+    cases = {}
+
+    for path_id, lesson_id in EXECUTE_LESSONS:
+        code = lesson_code(path_id, lesson_id)
+
+        def run(code=code):
+            r = client.post('/execute', json={'code': code})
+            assert r.status_code == 200
+
+        cases[f'execute:{lesson_id}'] = run
+
+    def get(url):
+        def run():
+            r = client.get(url)
+            assert r.status_code == 200
+        return run
+
+    cases['render:/'] = get('/')
+    cases['render:/path/<id>'] = get('/path/fundamentals')
+    cases['render:/lesson/<p>/<l>'] = get('/lesson/fundamentals/hello_world')
+
+    counter = iter(range(10 ** 9))
+    cases['progress:mark_complete'] = lambda: progress.mark_complete('bench_path_0', f'new_{next(counter)}')
+    cases['progress:get_progress'] = lambda: progress.get_progress('fundamentals', 5)
+    return cases
+
+
+def time_case(func, rounds, warmup):
+    """Run func repeatedly and return per-call timings in milliseconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'max_ms': round(max(samples), 4),
+        'rounds': rounds,
+    }
+
+
+def run_benchmarks(rounds=30, warmup=3, name_filter=None, num_paths=2000, lessons_per_path=25):
+    """Run every case against a temporary large progress file and usage ledger"""
+    original_file, original_ledger = progress.PROGRESS_FILE, usage.LEDGER
+    with tempfile.TemporaryDirectory() as tmp:
+        progress.PROGRESS_FILE = os.path.join(tmp, 'progress_data.json')
+        usage.LEDGER = usage.UsageLedger(path=os.path.join(tmp, 'usage_data.json'))
+        try:
+            build_progress_file(progress.PROGRESS_FILE, num_paths, lessons_per_path)
+            cases = build_cases(app.test_client())
+            results = {}
+            for name, func in cases.items():
+                if name_filter and name_filter not in name:
+                    continue
+                results[name] = time_case(func, rounds, warmup)
+                print(f"  {name:<32} median {results[name]['median_ms']:>9.3f} ms")
+        finally:
+            usage.LEDGER.flush()   # before the directory goes, so its flusher has nothing left
+            progress.PROGRESS_FILE, usage.LEDGER = original_file, original_ledger
+    return results
+
+
+# CPU-bound snippet for backend throughput: long enough that parallelism matters
+THROUGHPUT_CODE = '''total = 0
+for i in range(200000):
+    total += i * i
+print(total)
+'''
+
+
+def measure_throughput(backend_name, workers, threads, runs):
+    """Runs/sec for one execution backend with `threads` concurrent callers"""
+    backend = executor.make_backend(backend_name, workers)
+    try:
+        if hasattr(backend, 'warm_up'):
+            backend.warm_up()
+        backend.run(THROUGHPUT_CODE)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(pool.map(lambda _: backend.run(THROUGHPUT_CODE)['outcome'], range(runs)))
+        elapsed = time.perf_counter() - start
+    finally:
+        backend.shutdown()
+    failed = sum(outcome != 'success' for outcome in outcomes)
+    return {'backend': backend.name, 'runs_per_sec': round(runs / elapsed, 2), 'failed': failed}
+
+
+def run_throughput(backends, workers, threads, runs):
+    print(f"\nThroughput: {runs} runs, {threads} concurrent callers, {workers} workers, {os.cpu_count()} CPUs")
+    results = {}
+    for name in backends:
+        result = measure_throughput(name, workers, threads, runs)
+        results[f'throughput:{name}'] = result
+        label = name if result['backend'] == name else f"{name} (ran as {result['backend']})"
+        print(f"  {label:<32} {result['runs_per_sec']:>9.2f} runs/s  failed {result['failed']}")
+    return results
+
+
+def _p95(samples):
+    return statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+
+
+def measure_regrade(backend_name, workers, submissions, threads, probes=40):
+    """Lesson-run latency alone, then while a batch regrade floods the scheduler"""
+    executor.configure(backend_name, workers)
+    backend = executor.get_backend()
+    if hasattr(backend, 'warm_up'):
+        backend.warm_up()
+
+    def probe_latencies():
+        samples = []
+        for i in range(probes):
+            start = time.perf_counter()
+            # A distinct comment per run so nothing is coalesced
+            executor.run(f'# probe {i}\n' + THROUGHPUT_CODE, user='learner', priority='interactive')
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    quiet = probe_latencies()
+    pending = iter(range(submissions))
+    lock = threading.Lock()
+
+    def grade():
+        while True:
+            with lock:
+                i = next(pending, None)
+            if i is None:
+                return
+            executor.run(f'# submission {i}\n' + THROUGHPUT_CODE, user='instructor', priority='batch')
+
+    start = time.perf_counter()
+    graders = [threading.Thread(target=grade, daemon=True) for _ in range(threads)]
+    for thread in graders:
+        thread.start()
+    busy = probe_latencies()
+    for thread in graders:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    executor.configure()
+    return {
+        'backend': backend.name,
+        'quiet_p95_ms': round(_p95(quiet), 2),
+        'regrade_p95_ms': round(_p95(busy), 2),
+        'regrade_runs_per_sec': round(submissions / elapsed, 2),
+    }
+
+
+def run_regrade(backends, workers, submissions, threads):
+    print(f"\nRegrade: {submissions} batch runs from {threads} callers, {workers} workers, {os.cpu_count()} CPUs")
+    results = {}
+    for name in backends:
+        result = measure_regrade(name, workers, submissions, threads)
+        results[f'regrade:{name}'] = result
+        print(f"  {result['backend']:<16} lesson p95 {result['quiet_p95_ms']:>8.2f} ms alone, "
+              f"{result['regrade_p95_ms']:>8.2f} ms during regrade  "
+              f"({result['regrade_runs_per_sec']:.1f} batch runs/s)")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the list of (case, baseline_ms, current_ms) that regressed"""
+    regressions = []
+    print(f"\n{'case':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            print(f"{name:<32} {'-':>10} {current['median_ms']:>10.3f}      new")
+            continue
+        change = (current['median_ms'] - base['median_ms']) / base['median_ms'] if base['median_ms'] else 0.0
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{name:<32} {base['median_ms']:>10.3f} {current['median_ms']:>10.3f} {change:>+7.1%}{flag}")
+        if change > threshold:
+            regressions.append((name, base['median_ms'], current['median_ms']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the learning platform hot paths')
+    parser.add_argument('--rounds', type=int, default=30, help='Timed calls per case')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed calls per case')
+    parser.add_argument('--filter', help='Only run cases whose name contains this text')
+    parser.add_argument('--progress-paths', type=int, default=2000, help='Extra paths in the synthetic progress file')
+    parser.add_argument('--save', metavar='FILE', help='Write results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='Compare against a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed median slowdown before failing, as a fraction (default 0.25)')
+    parser.add_argument('--throughput', action='store_true',
+                        help='Measure runs/sec of each execution backend instead of the hot paths')
+    parser.add_argument('--backends', default='inline,process,subinterpreter',
+                        help='Comma-separated execution backends for --throughput')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Pool size for --throughput')
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent callers for --throughput')
+    parser.add_argument('--runs', type=int, default=200, help='Total runs per backend for --throughput')
+    parser.add_argument('--regrade', type=int, metavar='N',
+                        help='Time lesson runs while N batch runs queue in the scheduler')
+    args = parser.parse_args(argv)
+
+    if args.throughput:
+        run_throughput(args.backends.split(','), args.workers, args.threads, args.runs)
+        return 0
+    if args.regrade:
+        run_regrade(args.backends.split(','), args.workers, args.regrade, args.threads)
+        return 0
+
+    print("=" * 60)
+    print("ACA LEARNING PLATFORM - HOT PATH BENCHMARKS")
+    print("=" * 60)
+    results = run_benchmarks(args.rounds, args.warmup, args.filter, args.progress_paths)
+
+    if args.save:
+        payload = {
+            'meta': {
+                'created': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'rounds': args.rounds,
+                'progress_paths': args.progress_paths,
+            },
+            'results': results,
+        }
+        with open(args.save, 'w') as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            return 1
+        print("\nNo regressions beyond threshold")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
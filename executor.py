@@ -0,0 +1,585 @@
+"""
+Execution Backends
+Chooses where /execute runs learner code: inline, a process pool or a subinterpreter pool
+
+    inline          run_code in the request thread (default)
+    process         pool of `python sandbox.py --worker` child processes
+    subinterpreter  pool of isolated subinterpreters, each with its own GIL
+                    (Python 3.12+; falls back to process when unavailable)
+
+Configure with ACA_EXECUTION_BACKEND and ACA_EXECUTION_WORKERS (default:
+CPU count), or call configure(). Pool workers speak the sandbox.serve
+JSON-lines protocol.
+
+Identical deterministic submissions that arrive while one is already
+running share its result instead of running again (ACA_COALESCE=0 turns
+this off).
+
+Every run first waits its turn in the fair-share scheduler (scheduler.py),
+which admits as many runs as there are workers: lesson runs before
+playground runs before batch jobs, and users in turn within each class.
+
+Runs take an optional sandbox.CancelToken. Starting a run under the same
+run key as one still going cancels the older run (supersede), and
+watch_disconnect cancels a run whose HTTP client has gone away.
+"""
+
+import ast
+import atexit
+import functools
+import hashlib
+import importlib
+import json
+import os
+import queue
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from contextlib import contextmanager, nullcontext
+
+import metrics
+import sandbox
+import scheduler
+
+BACKEND = os.environ.get('ACA_EXECUTION_BACKEND', 'inline')
+WORKERS = int(os.environ.get('ACA_EXECUTION_WORKERS', '0')) or os.cpu_count() or 2
+# Extra wait past the time limit before a silent worker is written off
+HARD_TIMEOUT_GRACE = 2.0
+COALESCE = os.environ.get('ACA_COALESCE', '1') != '0'
+# Code touching these may print something different on every run
+NONDETERMINISTIC_MODULES = frozenset({'random', 'datetime', 'time', 'calendar', 'uuid', 'secrets'})
+NONDETERMINISTIC_NAMES = frozenset({'id', 'hash', 'input'})
+
+COALESCED = metrics.Counter('aca_execute_coalesced_total', 'Executions answered by an identical in-flight run')
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class WorkerLost(Exception):
+    """The worker died or stopped answering; it has been replaced"""
+
+
+class PipeWorker:
+    """One worker at the end of a pair of pipes, read by a pump thread"""
+
+    def _pump(self, stream):
+        for line in stream:
+            self._replies.put(line)
+        self._replies.put(None)
+
+    def send(self, message):
+        try:
+            self._send(json.dumps(message) + '\n')
+        except OSError:
+            self.close()
+            raise WorkerLost()
+
+    def receive(self, timeout):
+        """Next message from the worker, waiting at most timeout seconds"""
+        try:
+            line = self._replies.get(timeout=timeout)
+        except queue.Empty:
+            line = None
+        if line is None:
+            self.close()
+            raise WorkerLost()
+        return json.loads(line)
+
+    def run(self, job, timeout):
+        self.send(job)
+        return self.receive(timeout)
+
+    def abort(self):
+        """Stop the job in progress; the worker is lost afterwards"""
+        self.close()
+
+
+class ProcessWorker(PipeWorker):
+    """Child process running sandbox.worker_main
+
+    mode '--session' starts a REPL session worker (sandbox.serve_session).
+    """
+
+    def __init__(self, mode='--worker'):
+        self._proc = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'sandbox.py'), mode],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+        )
+        self._replies = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._proc.stdout,), daemon=True).start()
+
+    def _send(self, text):
+        self._proc.stdin.write(text)
+        self._proc.stdin.flush()
+
+    def close(self):
+        try:
+            self._proc.kill()
+            self._proc.wait(timeout=2)
+        except Exception:
+            pass
+
+
+def _interpreters_module():
+    """The low-level subinterpreter module, or None before Python 3.12"""
+    if sys.version_info < (3, 12):
+        return None
+    for name in ('_interpreters', '_xxsubinterpreters'):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return None
+
+
+class SubinterpreterWorker(PipeWorker):
+    """Isolated subinterpreter running sandbox.serve on its own OS thread
+
+    Each subinterpreter has its own GIL, so workers run learner code in
+    parallel inside one process. The time limit is enforced inside the
+    interpreter with sys.monitoring; a worker that still overruns cannot
+    be killed, so it is abandoned and replaced.
+    """
+
+    def __init__(self):
+        job_read, self._job_write = os.pipe()
+        reply_read, reply_write = os.pipe()
+        self._replies = queue.Queue()
+        self._thread = threading.Thread(target=self._serve, args=(job_read, reply_write), daemon=True)
+        self._thread.start()
+        threading.Thread(
+            target=self._pump, args=(os.fdopen(reply_read, 'r', encoding='utf-8'),), daemon=True
+        ).start()
+
+    @staticmethod
+    def _serve(job_read, reply_write):
+        # Create, run and destroy on one OS thread: 3.12 hangs destroying an
+        # interpreter that imported threading from a different thread
+        interpreters = _interpreters_module()
+        try:
+            interp = interpreters.create(isolated=True)   # 3.12
+        except TypeError:
+            interp = interpreters.create()                # 3.13+: isolated by default
+        script = (
+            'import os, sys\n'
+            f'sys.path.insert(0, {ROOT!r})\n'
+            'import sandbox\n'
+            f"sandbox.serve(os.fdopen({job_read}, 'r', encoding='utf-8'),\n"
+            f"              os.fdopen({reply_write}, 'w', encoding='utf-8'), enforce='monitoring')\n"
+        )
+        try:
+            interpreters.run_string(interp, script)
+        finally:
+            interpreters.destroy(interp)
+
+    def _send(self, text):
+        os.write(self._job_write, text.encode('utf-8'))
+
+    def close(self):
+        # EOF ends the serve loop and the thread destroys the interpreter;
+        # one still stuck in a job is left to finish on its own
+        try:
+            os.close(self._job_write)
+        except OSError:
+            pass
+        self._thread.join(timeout=1)
+
+    def abort(self):
+        # A running subinterpreter cannot be interrupted from outside: wake
+        # the waiting caller and let the job stop at its own deadline
+        self._replies.put(None)
+        self.close()
+
+
+class InlineBackend:
+    """Runs code in the calling thread"""
+
+    name = 'inline'
+
+    def __init__(self):
+        sandbox.preload_modules()
+
+    def run(self, code, profile=False, time_limit=sandbox.TIME_LIMIT_SECONDS, files=None, cancel=None):
+        return sandbox.run_code(code, profile=profile, time_limit=time_limit, files=files, cancel=cancel)
+
+    def stats(self):
+        return {'workers': 0, 'busy': 0, 'queued': 0}
+
+    def shutdown(self):
+        pass
+
+
+class PoolBackend:
+    """Fixed-size pool of pipe workers, started lazily and replaced when lost"""
+
+    def __init__(self, name, factory, size):
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._busy = 0
+        self._waiting = 0
+
+    def _acquire(self):
+        with self._lock:
+            self._waiting += 1
+            spawn = self._idle.empty() and self._started < self.size
+            if spawn:
+                self._started += 1
+        try:
+            worker = self.factory() if spawn else self._idle.get()
+        except Exception:
+            with self._lock:
+                self._started -= 1
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        with self._lock:
+            self._busy += 1
+        return worker
+
+    def run(self, code, profile=False, time_limit=sandbox.TIME_LIMIT_SECONDS, files=None, cancel=None):
+        if cancel is not None and cancel.cancelled:
+            return cancelled_result(cancel)
+        worker = self._acquire()
+        job = {'code': code, 'profile': profile, 'time_limit': time_limit, 'files': files}
+        try:
+            # Cancelling kills the worker mid-job; a fresh one replaces it
+            with cancel.bind(worker.abort) if cancel is not None else nullcontext():
+                result = worker.run(job, timeout=time_limit + HARD_TIMEOUT_GRACE)
+        except WorkerLost:
+            worker = self._replace()
+            if cancel is not None and cancel.cancelled:
+                result = cancelled_result(cancel)
+            else:
+                # Killed at its deadline: it held the worker the whole time
+                result = {
+                    'success': False,
+                    'output': f'Error: Execution timed out after {time_limit:g} seconds',
+                    'outcome': 'timeout',
+                    'usage': {'cpu_seconds': time_limit, 'wall_seconds': time_limit, 'peak_memory_kb': None},
+                }
+        finally:
+            with self._lock:
+                self._busy -= 1
+            if worker is not None:
+                self._idle.put(worker)
+        return result
+
+    def _replace(self):
+        """Fresh worker for one that was lost, or None if it cannot start"""
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._started -= 1
+            return None
+
+    def warm_up(self):
+        """Start every worker now instead of on first use"""
+        workers = [self._acquire() for _ in range(self.size)]
+        with self._lock:
+            self._busy -= len(workers)
+        for worker in workers:
+            self._idle.put(worker)
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self._started, 'busy': self._busy, 'queued': self._waiting}
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._started = 0
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result"""
+
+    class _Call:
+        __slots__ = ('key', 'done', 'result', 'error', 'interested', 'cancel')
+
+        def __init__(self, key):
+            self.key = key
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.interested = 0
+            self.cancel = sandbox.CancelToken()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, cancel=None):
+        """(result, shared): shared is True when another caller's run was reused
+
+        func(token) runs once per key with a CancelToken of its own, which
+        is cancelled only when every caller waiting on it has cancelled.
+        Each caller gets its own shallow copy of the result dict; a
+        follower that cancels stops waiting and gets (None, True).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call(key)
+            call.interested += 1
+        with cancel.bind(lambda: self._lose_interest(call, cancel.reason)) if cancel is not None else nullcontext():
+            if not leader:
+                while not call.done.wait(0.05):
+                    if cancel is not None and cancel.cancelled:
+                        return None, True
+                if call.error is not None:
+                    raise call.error
+                return dict(call.result), True
+            try:
+                result = func(call.cancel)
+                call.result = dict(result)
+                return result, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                self._forget(call)
+                call.done.set()
+
+    def _lose_interest(self, call, reason):
+        with self._lock:
+            call.interested -= 1
+            last = call.interested == 0
+        if last:
+            # Later arrivals must start afresh, not share a cancelled result
+            self._forget(call)
+            call.cancel.cancel(reason)
+
+    def _forget(self, call):
+        with self._lock:
+            if self._calls.get(call.key) is call:
+                del self._calls[call.key]
+
+
+@functools.lru_cache(maxsize=256)
+def is_deterministic(code):
+    """Whether every run of code should print the same thing
+
+    Conservative: importing a clock or random source, or calling id(),
+    hash() or input(), rules it out. Code that does not parse always
+    fails the same way.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return True
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.partition('.')[0] in NONDETERMINISTIC_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if (node.module or '').partition('.')[0] in NONDETERMINISTIC_MODULES:
+                return False
+        elif isinstance(node, ast.Name) and node.id in NONDETERMINISTIC_NAMES:
+            return False
+    return True
+
+
+def cancelled_result(cancel):
+    return {'success': False, 'output': f'Cancelled: {cancel.reason}', 'outcome': 'cancelled'}
+
+
+class RunRegistry:
+    """The newest run per run key; starting one cancels the one before"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = {}
+
+    @contextmanager
+    def supersede(self, key, cancel):
+        with self._lock:
+            previous = self._runs.get(key)
+            self._runs[key] = cancel
+        if previous is not None:
+            previous.cancel('superseded by a newer run')
+        try:
+            yield cancel
+        finally:
+            with self._lock:
+                if self._runs.get(key) is cancel:
+                    del self._runs[key]
+
+
+class DisconnectWatcher:
+    """One thread that cancels runs whose client socket has closed"""
+
+    POLL_SECONDS = 0.25
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watched = {}
+        self._thread = None
+
+    @contextmanager
+    def watch(self, sock, cancel):
+        with self._lock:
+            self._watched[id(cancel)] = (sock, cancel)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='disconnect-watcher', daemon=True)
+                self._thread.start()
+        try:
+            yield cancel
+        finally:
+            with self._lock:
+                self._watched.pop(id(cancel), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.POLL_SECONDS)
+            with self._lock:
+                watched = list(self._watched.values())
+            for sock, cancel in watched:
+                if _peer_closed(sock):
+                    cancel.cancel('client disconnected')
+
+
+# poll() where there is one: select() cannot take fd numbers of 1024 or more
+_Selector = getattr(selectors, 'PollSelector', selectors.SelectSelector)
+
+
+def _peer_closed(sock):
+    """Whether the other end closed; a request body still unread is not EOF"""
+    try:
+        with _Selector() as selector:
+            selector.register(sock, selectors.EVENT_READ)
+            readable = selector.select(0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        # ValueError: the socket was closed on this side (fileno -1)
+        return True
+
+
+RUNS = RunRegistry()
+DISCONNECTS = DisconnectWatcher()
+
+
+def _flight_key(code, time_limit, files, priority):
+    # Per class, so a lesson run never waits behind a batch job's queue slot
+    payload = json.dumps([code, time_limit, files, priority], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+_flights = SingleFlight()
+SCHEDULER = scheduler.FairScheduler(WORKERS)
+
+
+def make_backend(name, workers=None):
+    """Build a backend by name, falling back to process for subinterpreter"""
+    workers = workers or WORKERS
+    if name == 'subinterpreter':
+        if _interpreters_module() is not None:
+            return PoolBackend('subinterpreter', SubinterpreterWorker, workers)
+        warnings.warn("Subinterpreters need Python 3.12+; using the process backend", RuntimeWarning, stacklevel=2)
+        name = 'process'
+    if name == 'process':
+        return PoolBackend('process', ProcessWorker, workers)
+    if name == 'inline':
+        return InlineBackend()
+    raise ValueError(f"Unknown execution backend: {name}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend(BACKEND)
+    return _backend
+
+
+def configure(backend=None, workers=None):
+    """Switch backends at runtime; the old pool is shut down"""
+    global _backend, BACKEND, WORKERS
+    with _backend_lock:
+        if backend is not None:
+            BACKEND = backend
+        if workers is not None:
+            WORKERS = workers
+        old, _backend = _backend, make_backend(BACKEND, WORKERS)
+    SCHEDULER.resize(WORKERS)
+    if old is not None:
+        old.shutdown()
+    return _backend
+
+
+def run(code, profile=False, time_limit=sandbox.TIME_LIMIT_SECONDS, files=None, cancel=None,
+        user=None, priority='playground'):
+    """Run learner code on the configured backend; same result as sandbox.run_code
+
+    files seeds the run's virtual filesystem (name -> text). Profiled
+    runs always run on their own. cancel is an optional CancelToken.
+    user and priority (one of scheduler.PRIORITIES) place the run in the
+    fair-share queue.
+    """
+    backend = get_backend()
+    if cancel is not None and cancel.cancelled:
+        return cancelled_result(cancel)
+
+    def scheduled(token, profile=False):
+        ticket = SCHEDULER.acquire(user, priority, token)
+        if ticket is None:
+            return cancelled_result(token)
+        try:
+            return backend.run(code, profile=profile, time_limit=time_limit, files=files, cancel=token)
+        finally:
+            SCHEDULER.release(ticket)
+
+    if profile or not COALESCE or not is_deterministic(code):
+        return scheduled(cancel, profile)
+    result, shared = _flights.do(_flight_key(code, time_limit, files, priority), scheduled, cancel)
+    if result is None:
+        return cancelled_result(cancel)
+    if shared:
+        COALESCED.inc()
+        # The run that produced it is charged to its own caller
+        result.pop('usage', None)
+    return result
+
+
+atexit.register(lambda: _backend is not None and _backend.shutdown())
+
+metrics.Gauge(
+    'aca_execute_queue_depth', 'Executions waiting for a free worker',
+    lambda: get_backend().stats()['queued'] + sum(c['queued'] for c in SCHEDULER.stats().values())
+)
+metrics.Gauge(
+    'aca_scheduler_queued', 'Executions waiting in the fair-share scheduler', labelnames=('priority',),
+    func=lambda: {(name,): c['queued'] for name, c in SCHEDULER.stats().items()}
+)
+metrics.Gauge(
+    'aca_execute_workers', 'Execution workers by state', labelnames=('state',),
+    func=lambda: _worker_states(get_backend().stats())
+)
+
+
+def _worker_states(stats):
+    return {('busy',): stats['busy'], ('idle',): stats['workers'] - stats['busy']}
@@ -14,12 +14,17 @@ Complete integrated application combining:
 """
 from __future__ import annotations
 import argparse
+import atexit
 import hashlib
+import itertools
 import json
+import mmap
 import os
+import queue
 import re
 import subprocess
 import sys
+import threading
 import time
 import tkinter as tk
 from datetime import datetime
@@ -44,6 +49,12 @@ README_PATH = os.path.join(BASE_DIR, "README.md")
 ROADMAP_PATH = os.path.join(BASE_DIR, "DeepLearning_Roadmap.ipynb")
 SANDBOX_DIR = os.path.join(os.path.expanduser("~"), "aca_data")
 os.makedirs(SANDBOX_DIR, exist_ok=True)
+MANIFEST_LOG_PATH = os.path.join(SANDBOX_DIR, "manifest.jsonl")
+
+# File reader settings
+READ_BLOCK_SIZE = 64 * 1024
+READ_MMAP_THRESHOLD = 8 * 1024 * 1024
+BINARY_SNIFF_BYTES = 8192
 
 # Policy settings
 POLICY = {
@@ -54,6 +65,12 @@ POLICY = {
             "confirm_required": True,
             "timeout_seconds": 8,
             "restricted_globals": True
+        },
+        "manifest": {
+            "flush_interval_seconds": 0.5,
+            "batch_size": 256,
+            "max_bytes": 5 * 1024 * 1024,
+            "backups": 3
         }
     }
 }
@@ -2023,18 +2040,103 @@ def safe_exec(code: str, context: str = "", *, auto_confirm: bool | None = None)
         return f"❌ Error: {type(exc).__name__}: {str(exc)}"
 
 
+class ManifestWriter:
+    """Background writer for the append-only JSONL audit log.
+
+    Records are queued by callers and written in batches by a daemon thread,
+    so tool calls never wait on disk. The log is rotated to ``.1`` .. ``.N``
+    once it grows past ``max_bytes``.
+    """
+
+    def __init__(self, path: str, *, flush_interval: float = 0.5, batch_size: int = 256,
+                 max_bytes: int = 5 * 1024 * 1024, backups: int = 3):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.Queue[Dict[str, Any] | None]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="manifest-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+        self._queue.put(record)
+
+    def close(self) -> None:
+        """Flush queued records and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            records = [r for r in batch if r is not None]
+            if records:
+                try:
+                    self._write(records)
+                except OSError as exc:
+                    print(f"⚠ Manifest write failed: {exc}", file=sys.stderr)
+            if stop:
+                return
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(payload)
+            size = f.tell()
+        if size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+_manifest_cfg = POLICY["sandbox"]["manifest"]
+MANIFEST_WRITER = ManifestWriter(
+    MANIFEST_LOG_PATH,
+    flush_interval=_manifest_cfg["flush_interval_seconds"],
+    batch_size=_manifest_cfg["batch_size"],
+    max_bytes=_manifest_cfg["max_bytes"],
+    backups=_manifest_cfg["backups"],
+)
+
+
 def save_manifest(mode: str, input_text: str) -> str:
-    """Save execution manifest for audit trail."""
+    """Queue an execution manifest record for the audit trail."""
     manifest = {
         "timestamp": datetime.now().isoformat(),
         "mode": mode,
         "input_hash": hashlib.sha256(input_text.encode()).hexdigest()[:16],
         "status": "ok"
     }
-    manifest_path = os.path.join(SANDBOX_DIR, "last_run.json")
-    with open(manifest_path, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
-    return manifest_path
+    MANIFEST_WRITER.submit(manifest)
+    return MANIFEST_LOG_PATH
 
 # ============================================================================
 # COPILOT TOOLS
@@ -2047,15 +2149,80 @@ def run_code(code: str, *, auto_confirm: bool | None = None) -> str:
     return result
 
 
-def read_file(path: str, lines: int = 20) -> str:
-    """Read first N lines of a file."""
+def _is_binary(f) -> bool:
+    """Treat files with NUL bytes in their first block as binary."""
+    chunk = f.read(BINARY_SNIFF_BYTES)
+    f.seek(0)
+    return b"\0" in chunk
+
+
+def _head_lines(f, size: int, start: int, count: int) -> bytes:
+    """Return ``count`` lines starting at 1-based line ``start``."""
+    if size < READ_MMAP_THRESHOLD:
+        return b"".join(itertools.islice(f, start - 1, start - 1 + count))
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        for _ in range(start - 1):
+            pos = mm.find(b"\n", pos) + 1
+            if pos == 0:
+                return b""
+        end = pos
+        for _ in range(count):
+            newline = mm.find(b"\n", end)
+            if newline < 0:
+                end = size
+                break
+            end = newline + 1
+        return mm[pos:end]
+
+
+def _tail_lines(f, size: int, count: int) -> bytes:
+    """Return the last ``count`` lines, scanning backwards from the end."""
+    if size < READ_MMAP_THRESHOLD:
+        blocks: List[bytes] = []
+        newlines = 0
+        offset = size
+        while offset > 0 and newlines <= count:
+            step = min(READ_BLOCK_SIZE, offset)
+            offset -= step
+            f.seek(offset)
+            block = f.read(step)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+        data = b"".join(reversed(blocks))
+        return b"".join(data.splitlines(keepends=True)[-count:])
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = size - 1 if mm[size - 1:size] == b"\n" else size
+        for _ in range(count):
+            pos = mm.rfind(b"\n", 0, pos)
+            if pos < 0:
+                return mm[:]
+        return mm[pos + 1:]
+
+
+def read_file(path: str, lines: int = 20, *, tail: bool = False, start: int = 1) -> str:
+    """Read N lines of a file: the first N, the last N (tail) or N from line ``start``.
+
+    Lines are streamed from disk (mmap for large files), so memory use does
+    not depend on the file size.
+    """
     if not os.path.exists(path):
         return f"❌ File not found: {path}"
+    if lines <= 0:
+        return ""
     try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            content = "".join(f.readlines()[:lines])
+        with open(path, "rb") as f:
+            if _is_binary(f):
+                return f"❌ Binary file, not shown: {path}"
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                data = b""
+            elif tail:
+                data = _tail_lines(f, size, lines)
+            else:
+                data = _head_lines(f, size, max(start, 1), lines)
         save_manifest("copilot_read", path)
-        return content
+        return data.decode("utf-8", errors="ignore").replace("\r\n", "\n")
     except Exception as exc:
         return f"❌ Error reading file: {exc}"
 
@@ -2521,7 +2688,7 @@ def run_cli(args):
         print(run_code(args.run, auto_confirm=True))
     
     if args.read:
-        print(read_file(args.read))
+        print(read_file(args.read, args.lines, tail=args.tail, start=args.start))
     
     if args.explain:
         print(explain_code(args.explain))
@@ -2549,6 +2716,9 @@ def main(argv: list[str] | None = None):
     parser.add_argument("--open", choices=["lab1", "lab2", "lab3", "readme", "roadmap"], help="Open folder/file")
     parser.add_argument("--run", help="Run code snippet")
     parser.add_argument("--read", help="Read file")
+    parser.add_argument("--lines", type=int, default=20, help="Number of lines for --read")
+    parser.add_argument("--tail", action="store_true", help="With --read, show the last lines")
+    parser.add_argument("--start", type=int, default=1, help="With --read, first line to show (1-based)")
     parser.add_argument("--explain", help="Explain code")
     parser.add_argument("--lint", help="Lint code")
     parser.add_argument("--analyze", help="Analyze code")
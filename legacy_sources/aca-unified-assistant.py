@@ -1,8 +1,20 @@
+import atexit
+import contextlib
+import hashlib
+import heapq
 import importlib.util
+import io
 import json
+import multiprocessing
 import os
+import queue
 import re
-from collections import Counter
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from itertools import repeat
 import subprocess
 import sys
 import tkinter as tk
@@ -19,6 +31,11 @@ ACA_GUI = ACA_DIR / "aca-gui.py"
 ASSISTANT_PLAN = BASE / "deep_learning_assistant.py"
 PROGRESS_PATH = BASE / "learning_progress.json"
 NOTES_PATH = BASE / "learning_notes.txt"
+NOTES_HISTORY_PATH = BASE / "learning_notes.history.jsonl"
+NOTES_HISTORY_KEEP = 50
+TEXT_CACHE_DIR = BASE / "text_cache"
+READ_CHUNK_CHARS = 1 << 20
+PDF_POOL_MIN_PAGES = 16
 
 STOPWORDS = {
     "the", "and", "a", "an", "to", "of", "in", "on", "for", "with", "that", "as",
@@ -31,6 +48,10 @@ STOPWORDS = {
 }
 
 
+WORD_RE = re.compile(r"\b\w+\b")
+SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+
+
 NEXT_SUGGESTIONS = {
     "Phase 1": "Finish a math refresher video; derive d/dx for a simple chain rule; run a small tensor example.",
     "Phase 2": "Complete a PyTorch tutorial cell; tweak a hyperparameter; log the loss trend.",
@@ -103,7 +124,13 @@ def build_rulebook_fallback():
     return {}
 
 
+_RUNNER_MODULE = None
+
+
 def load_runner_module():
+    global _RUNNER_MODULE
+    if _RUNNER_MODULE is not None:
+        return _RUNNER_MODULE
     runner_path = ACA_DIR / "tools" / "runner.py"
     if not runner_path.exists():
         return None
@@ -113,9 +140,275 @@ def load_runner_module():
     module = importlib.util.module_from_spec(spec)
     try:
         spec.loader.exec_module(module)
-        return module
     except Exception:
         return None
+    _RUNNER_MODULE = module
+    return module
+
+
+# ----------------- Rulebook matching -----------------
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class RuleMatcher:
+    """Aho-Corasick automaton over rulebook terms, compiled once.
+
+    ``find`` reports every term in a piece of code in a single pass, only
+    where the term is not glued to surrounding identifier characters.
+    The same trie answers exact and prefix lookups for the search box.
+    """
+
+    def __init__(self, terms):
+        self.terms = [t for t in terms if t]
+        self._lengths = [len(t.lower()) for t in self.terms]
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._ends = [[]]
+        self._exact = {}
+        for idx, term in enumerate(self.terms):
+            lower = term.lower()
+            self._exact.setdefault(lower, term)
+            self._exact.setdefault(lower.rstrip("()"), term)
+            node = 0
+            for ch in lower:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._ends.append([])
+                node = nxt
+            self._ends[node].append(idx)
+            self._out[node].append(idx)
+
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, nxt in self._goto[node].items():
+                pending.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str):
+        """Return the rulebook-ordered terms that occur in ``text``."""
+        lower = text.lower()
+        size = len(lower)
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for i, ch in enumerate(lower):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                if idx in found:
+                    continue
+                start = i - self._lengths[idx] + 1
+                if _is_word_char(lower[start]) and start > 0 and _is_word_char(lower[start - 1]):
+                    continue
+                if _is_word_char(ch) and i + 1 < size and _is_word_char(lower[i + 1]):
+                    continue
+                found.add(idx)
+        return [self.terms[idx] for idx in sorted(found)]
+
+    def lookup(self, term: str):
+        """Case-insensitive exact match, ignoring a trailing ``()``."""
+        lower = term.lower()
+        return self._exact.get(lower) or self._exact.get(lower.rstrip("()"))
+
+    def complete(self, prefix: str, limit: int = 20):
+        """Terms starting with ``prefix`` (case-insensitive), alphabetically."""
+        node = 0
+        for ch in prefix.lower():
+            node = self._goto[node].get(ch)
+            if node is None:
+                return []
+        results = []
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            results.extend(self.terms[idx] for idx in self._ends[node])
+            stack.extend(nxt for _ch, nxt in sorted(self._goto[node].items(), reverse=True))
+        return results[:limit]
+
+
+# ----------------- Resident workers -----------------
+
+@contextlib.contextmanager
+def _capture_fds():
+    """Send writes to fds 1 and 2 into temp files for the duration of a request.
+
+    Yields a dict that maps each fd to the text written to it, filled in on
+    exit, once both fds have been pointed back where they were.
+    """
+    captured = {}
+    files = {fd: tempfile.TemporaryFile() for fd in (1, 2)}
+    saved = {fd: os.dup(fd) for fd in files}
+    try:
+        for fd, f in files.items():
+            os.dup2(f.fileno(), fd)
+        yield captured
+    finally:
+        for stream in (sys.__stdout__, sys.__stderr__):
+            with contextlib.suppress(Exception):
+                stream.flush()
+        for fd, f in files.items():
+            os.dup2(saved[fd], fd)
+            os.close(saved[fd])
+            f.seek(0)
+            captured[fd] = f.read().decode("utf-8", "replace")
+            f.close()
+
+
+def _serve_json_lines(handle):
+    """Child loop shared by the kernel and the command server.
+
+    Requests and replies are one JSON object per line. Replies go out on a
+    dup of the original stdout fd. While a request runs, sys.stdout and
+    sys.stderr are captured, and so are fds 1 and 2. Output from child
+    processes and C code therefore ends up in the reply instead of
+    corrupting it. Between requests fds 1 and 2 are left as they were.
+    """
+    proto = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except Exception:
+            continue
+        out, err = io.StringIO(), io.StringIO()
+        start = time.perf_counter()
+        with _capture_fds() as fds:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                try:
+                    handle(request)
+                except SystemExit as exc:
+                    if exc.code not in (None, 0):
+                        print(exc.code if isinstance(exc.code, str) else f"exit status {exc.code}", file=sys.stderr)
+                except BaseException:
+                    traceback.print_exc()
+        elapsed = int((time.perf_counter() - start) * 1000)
+        reply = {"stdout": out.getvalue() + fds[1], "stderr": err.getvalue() + fds[2], "elapsed_ms": elapsed}
+        proto.write(json.dumps(reply) + "\n")
+        proto.flush()
+
+
+def kernel_main():
+    """Child side of CodeKernel: run cells in one shared namespace."""
+    namespace = {"__name__": "__main__"}
+    _serve_json_lines(lambda req: exec(compile(req["code"], "<cell>", "exec"), namespace))
+
+
+def command_server_main():
+    """Child side of CommandServer: run run.py commands without a new interpreter.
+
+    run.py is executed as __main__ with the command in sys.argv, exactly as
+    `python run.py <cmd>` would, but the libraries it imports stay loaded.
+    """
+    import runpy
+
+    sys.path.insert(0, str(RUNNER.parent))
+
+    def handle(req):
+        sys.argv = [str(RUNNER), req["cmd"]]
+        runpy.run_path(str(RUNNER), run_name="__main__")
+
+    _serve_json_lines(handle)
+
+
+class JsonLineWorker:
+    """Lazily started child process speaking line-delimited JSON over pipes.
+
+    The child is restarted on the next request after it exits or misses the
+    timeout.
+    """
+
+    role = ""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._proc = None
+        self._replies = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._proc = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), self.role],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self._replies = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._proc, self._replies), daemon=True).start()
+
+    @staticmethod
+    def _pump(proc, replies):
+        for line in proc.stdout:
+            replies.put(line)
+        replies.put(None)
+
+    def request(self, payload: dict, lost_state: str = "") -> dict:
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            try:
+                self._proc.stdin.write(json.dumps(payload) + "\n")
+                self._proc.stdin.flush()
+                line = self._replies.get(timeout=self.timeout)
+            except queue.Empty:
+                self.shutdown()
+                return {"stderr": f"Timed out after {self.timeout}s; restarted{lost_state}."}
+            except BrokenPipeError:
+                line = None
+            if line is None:
+                self.shutdown()
+                return {"stderr": f"Worker exited; it will restart on the next run{lost_state}."}
+            return json.loads(line)
+
+    def shutdown(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+            proc.wait(timeout=2)
+        except Exception:
+            pass
+
+
+class CodeKernel(JsonLineWorker):
+    """Long-lived Python subprocess that keeps imports and variables between cells."""
+
+    role = "--kernel"
+
+    def run_cell(self, code: str) -> dict:
+        return self.request({"code": code}, " (variables cleared)")
+
+
+class CommandServer(JsonLineWorker):
+    """Resident run.py process for dashboard commands."""
+
+    role = "--command-server"
+
+    def run(self, cmd: str) -> dict:
+        return self.request({"cmd": cmd})
+
+
+KERNEL = CodeKernel(timeout=5)
+COMMAND_SERVER = CommandServer(timeout=10)
+atexit.register(KERNEL.shutdown)
+atexit.register(COMMAND_SERVER.shutdown)
 
 
 # ----------------- ACA calls -----------------
@@ -125,14 +418,9 @@ def call_run(cmd: str) -> str:
     if not RUNNER.exists():
         return "run.py not found."
     try:
-        res = subprocess.run(
-            [sys.executable, str(RUNNER), cmd],
-            capture_output=True,
-            text=True,
-            timeout=10,
-        )
-        out = res.stdout or ""
-        err = res.stderr or ""
+        res = COMMAND_SERVER.run(cmd)
+        out = res.get("stdout", "")
+        err = res.get("stderr", "")
         return (out + ("\n" + err if err else "")).strip()
     except Exception as exc:
         return f"Error: {exc}"
@@ -156,13 +444,16 @@ def cuda_warning_for_code(code: str) -> str:
 
 
 def run_code_snippet(code: str) -> str:
-    runner = load_runner_module()
-    if not runner:
-        return "Runner not found."
-    run_cell = getattr(runner, "run_cell", None)
-    if not callable(run_cell):
-        return "Runner unavailable."
-    result = run_cell(code, 5)
+    try:
+        result = KERNEL.run_cell(code)
+    except OSError:
+        runner = load_runner_module()
+        if not runner:
+            return "Runner not found."
+        run_cell = getattr(runner, "run_cell", None)
+        if not callable(run_cell):
+            return "Runner unavailable."
+        result = run_cell(code, 5)
     out = result.get("stdout", "")
     err = result.get("stderr", "")
     elapsed = result.get("elapsed_ms", None)
@@ -213,20 +504,139 @@ def open_aca_gui():
         return f"Error: {exc}"
 
 
+def iter_sentences(chunks):
+    """Yield sentences from an iterable of text chunks without joining them."""
+    carry = ""
+    for chunk in chunks:
+        parts = SENTENCE_BREAK_RE.split(carry + chunk)
+        carry = parts.pop()
+        for sent in parts:
+            sent = sent.strip()
+            if sent:
+                yield sent
+    carry = carry.strip()
+    if carry:
+        yield carry
+
+
+def _count_words(chunks) -> dict:
+    """Content-word frequencies, tokenizing each chunk in a single regex pass."""
+    freq = Counter()
+    carry = ""
+    for chunk in chunks:
+        buf = carry + chunk.lower()
+        cut = len(buf)
+        while cut and (buf[cut - 1].isalnum() or buf[cut - 1] == "_"):
+            cut -= 1
+        freq.update(WORD_RE.findall(buf, 0, cut))
+        carry = buf[cut:]
+    freq.update(WORD_RE.findall(carry))
+    for word in STOPWORDS:
+        freq.pop(word, None)
+    return dict(freq)
+
+
+def summarize_chunks(make_chunks, num_sentences: int = 3) -> str:
+    """Extractive summary of a chunked document in linear time.
+
+    ``make_chunks`` returns a fresh iterable of text chunks and is called
+    twice: once to count word frequencies, once to score sentences. Only
+    the vocabulary and the current top ``num_sentences`` are held in memory.
+    """
+    freq_get = _count_words(make_chunks()).get
+    top = []
+    for index, sent in enumerate(iter_sentences(make_chunks())):
+        tokens = WORD_RE.findall(sent.lower())
+        item = (sum(map(freq_get, tokens, repeat(0, len(tokens)))), -index, sent)
+        if len(top) < num_sentences:
+            heapq.heappush(top, item)
+        elif item > top[0]:
+            heapq.heapreplace(top, item)
+    return " ".join(sent for _score, _neg_index, sent in sorted(top, key=lambda item: -item[1]))
+
+
 def summarize_text(text: str, num_sentences: int = 3) -> str:
-    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
-    if len(sentences) <= num_sentences:
+    sentences = iter_sentences([text])
+    if sum(1 for _ in zip(sentences, range(num_sentences + 1))) <= num_sentences:
         return text.strip()
-    words = re.findall(r"\b\w+\b", text.lower())
-    freq = Counter(w for w in words if w not in STOPWORDS)
-    scores = {}
-    for sent in sentences:
-        tokens = re.findall(r"\b\w+\b", sent.lower())
-        score = sum(freq.get(tok, 0) for tok in tokens if tok not in STOPWORDS)
-        scores[sent] = score
-    top_sents = sorted(scores, key=scores.get, reverse=True)[:num_sentences]
-    ordered = [s for s in sentences if s in top_sents]
-    return " ".join(ordered)
+    return summarize_chunks(lambda: [text], num_sentences)
+
+
+def iter_text_file(path, chunk_chars: int = READ_CHUNK_CHARS):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                return
+            yield chunk
+
+
+_PDF_READER = None
+
+
+def _init_pdf_worker(path: str):
+    global _PDF_READER
+    import PyPDF2  # type: ignore
+    _PDF_READER = PyPDF2.PdfReader(path)
+
+
+def _extract_pdf_page(index: int) -> str:
+    return _PDF_READER.pages[index].extract_text() or ""
+
+
+def _extract_pdf_pages(path: str):
+    """Yield page texts in order, extracting pages in a process pool for large PDFs."""
+    import PyPDF2  # type: ignore
+    reader = PyPDF2.PdfReader(path)
+    count = len(reader.pages)
+    if count < PDF_POOL_MIN_PAGES:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+    del reader
+    with multiprocessing.Pool(initializer=_init_pdf_worker, initargs=(path,)) as pool:
+        yield from pool.imap(_extract_pdf_page, range(count), chunksize=4)
+
+
+def _text_cache_path(path: str) -> Path:
+    stat = os.stat(path)
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return TEXT_CACHE_DIR / f"{key}-{stat.st_mtime_ns}-{stat.st_size}.txt"
+
+
+def iter_pdf_text(path: str):
+    """Yield a PDF's text page by page, cached on disk per path and mtime.
+
+    The first full read streams extracted pages into the cache file as they
+    arrive; later reads (and stale entries for the same path) use or replace it.
+    """
+    cache = _text_cache_path(path)
+    if cache.exists():
+        yield from iter_text_file(cache)
+        return
+    TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as out:
+        for text in _extract_pdf_pages(path):
+            out.write(text)
+            yield text
+    for stale in TEXT_CACHE_DIR.glob(cache.name.split("-", 1)[0] + "-*.txt"):
+        stale.unlink(missing_ok=True)
+    os.replace(tmp, cache)
+
+
+def summarize_file(path: str, num_sentences: int = 3) -> str:
+    if path.lower().endswith(".pdf"):
+        try:
+            import PyPDF2  # type: ignore  # noqa: F401
+        except Exception:
+            return "PDF support requires PyPDF2. Install it or choose a text file."
+        summary = summarize_chunks(lambda: iter_pdf_text(path), num_sentences)
+    else:
+        summary = summarize_chunks(lambda: iter_text_file(path), num_sentences)
+    if not summary.strip():
+        return "The selected file appears to be empty."
+    return summary
 
 
 def open_and_summarize_file() -> str:
@@ -237,26 +647,110 @@ def open_and_summarize_file() -> str:
     if not path:
         return "No file selected."
     try:
-        text = ""
-        if path.lower().endswith(".pdf"):
-            try:
-                import PyPDF2  # type: ignore
-            except Exception:
-                return "PDF support requires PyPDF2. Install it or choose a text file."
-            with open(path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    text += page.extract_text() or ""
-        else:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
-        if not text.strip():
-            return "The selected file appears to be empty."
-        return summarize_text(text)
+        return summarize_file(path)
     except Exception as exc:
         return f"Could not summarize the file: {exc}"
 
 
+# ----------------- Notes persistence -----------------
+
+def _atomic_write(path: Path, content: str):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class NotesStore:
+    """Saves notes on a background thread, only when their content changed.
+
+    The notes file is replaced atomically and every saved version is
+    appended to a JSONL revision history, which is compacted to the last
+    ``keep`` revisions once it holds twice that many.
+    """
+
+    def __init__(self, path: Path, history_path: Path, keep: int = NOTES_HISTORY_KEEP):
+        self.path = path
+        self.history_path = history_path
+        self.keep = keep
+        self.last_hash = None
+        self.last_error = None
+        self._pending = None
+        self._busy = False
+        self._revisions = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, name="notes-saver", daemon=True).start()
+
+    @staticmethod
+    def digest(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def load(self) -> str | None:
+        if not self.path.exists():
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            content = f.read()
+        self.last_hash = self.digest(content)
+        return content
+
+    def submit(self, content: str):
+        """Queue ``content`` for saving; only the newest pending version is kept."""
+        with self._cond:
+            self._pending = content
+            self._cond.notify()
+
+    def flush(self, timeout: float = 10) -> bool:
+        """Wait for queued saves to finish; False if the last save failed."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+            return self.last_error is None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                content, self._pending = self._pending, None
+                self._busy = True
+            error = None
+            try:
+                self._save(content)
+            except Exception as exc:
+                # Keep the saver alive; flush() reports the failure to the UI
+                traceback.print_exc()
+                error = exc
+            finally:
+                with self._cond:
+                    self.last_error = error
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _save(self, content: str):
+        digest = self.digest(content)
+        if digest == self.last_hash:
+            return
+        _atomic_write(self.path, content)
+        self.last_hash = digest
+        self._append_revision(digest, content)
+
+    def _append_revision(self, digest: str, content: str):
+        if self._revisions is None:
+            self._revisions = 0
+            if self.history_path.exists():
+                with open(self.history_path, "r", encoding="utf-8") as f:
+                    self._revisions = sum(1 for _ in f)
+        record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "sha256": digest, "text": content}
+        with open(self.history_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._revisions += 1
+        if self._revisions >= 2 * self.keep:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                recent = deque(f, maxlen=self.keep)
+            _atomic_write(self.history_path, "".join(recent))
+            self._revisions = len(recent)
+
+
 # ----------------- GUI -----------------
 
 class UnifiedApp(tk.Tk):
@@ -268,6 +762,7 @@ class UnifiedApp(tk.Tk):
 
         self.history = []
         self._notes_after_id = None
+        self.notes_store = NotesStore(NOTES_PATH, NOTES_HISTORY_PATH)
 
         aca_rules = load_aca_rulebook()
         if aca_rules:
@@ -276,11 +771,13 @@ class UnifiedApp(tk.Tk):
         else:
             self.rulebook = build_rulebook_fallback() or {}
             self.rulebook_source = "Assistant plan"
+        self.rule_matcher = RuleMatcher(self.rulebook)
 
         self.learning_plan = build_learning_plan()
         self.projects = build_projects()
 
         self._init_menu()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(expand=True, fill="both")
@@ -364,6 +861,7 @@ class UnifiedApp(tk.Tk):
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
         search_entry.bind("<Return>", lambda _e: self._lookup_rule())
+        search_entry.bind("<KeyRelease>", self._suggest_rules)
         ttk.Button(search_frame, text="Search", command=self._lookup_rule).pack(side=tk.LEFT, padx=(5, 0))
 
         result_text = tk.Text(frame, wrap=tk.WORD)
@@ -491,6 +989,13 @@ class UnifiedApp(tk.Tk):
         ttk.Button(btn_frame, text="Run Code", command=run_code_action).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Explain Code", command=explain_code_action).pack(side=tk.LEFT, padx=5)
 
+        def restart_kernel_action():
+            KERNEL.shutdown()
+            code_output.delete("1.0", tk.END)
+            code_output.insert(tk.END, "Kernel restarted. Variables and imports were cleared.")
+
+        ttk.Button(btn_frame, text="Restart Kernel", command=restart_kernel_action).pack(side=tk.LEFT, padx=5)
+
     def _init_summarize_tab(self):
         frame = ttk.Frame(self.notebook)
         self.notebook.add(frame, text="Summarize File")
@@ -666,33 +1171,45 @@ Tips:
         self.result_text.tag_configure("heading", font=("TkDefaultFont", 12, "bold"))
         self.result_text.config(state=tk.DISABLED)
 
+    def _show_rules(self, terms):
+        for term in terms:
+            self.result_text.insert(tk.END, f"{term}\n", "heading")
+            self.result_text.insert(tk.END, f"{self.rulebook[term]}\n\n")
+        self.result_text.tag_configure("heading", font=("TkDefaultFont", 12, "bold"))
+
     def _lookup_rule(self):
         term = self.search_var.get().strip()
         self.result_text.config(state=tk.NORMAL)
         self.result_text.delete("1.0", tk.END)
         if term:
-            key_norm = term.lower().rstrip("()")
-            match = None
-            if term in self.rulebook:
-                match = term
-            elif key_norm in self.rulebook:
-                match = key_norm
-            else:
-                for k in self.rulebook:
-                    if key_norm == k.lower():
-                        match = k
-                        break
-            if match:
+            match = term if term in self.rulebook else self.rule_matcher.lookup(term)
+            candidates = [match] if match else self.rule_matcher.complete(term)
+            if len(candidates) == 1:
+                match = candidates[0]
                 desc = self.rulebook[match]
                 self.result_text.insert(tk.END, f"{match}\n", "heading")
                 self.result_text.insert(tk.END, desc)
                 self.result_text.tag_configure("heading", font=("TkDefaultFont", 12, "bold"))
+            elif candidates:
+                self.result_text.insert(tk.END, "Did you mean:\n\n")
+                self._show_rules(candidates)
             else:
                 self.result_text.insert(tk.END, "I don't know that term yet. Add it to the rulebook.")
         else:
             self._populate_rulebook()
         self.result_text.config(state=tk.DISABLED)
 
+    def _suggest_rules(self, event=None):
+        if event is not None and event.keysym == "Return":
+            return
+        term = self.search_var.get().strip()
+        if not term:
+            self._populate_rulebook()
+            return
+        self.result_text.config(state=tk.NORMAL)
+        self.result_text.delete("1.0", tk.END)
+        self._show_rules(self.rule_matcher.complete(term))
+        self.result_text.config(state=tk.DISABLED)
 
     def _update_progress(self):
         total = max(len(self.progress_vars), 1)
@@ -723,26 +1240,27 @@ Tips:
             return
 
     def _save_notes(self, silent=False):
-        content = self.notes_text.get("1.0", tk.END)
-        try:
-            with open(NOTES_PATH, "w", encoding="utf-8") as f:
-                f.write(content)
-            if not silent:
-                self.status_var.set("Notes saved.")
-        except Exception:
-            if not silent:
-                self.status_var.set("Failed to save notes.")
+        if not silent or self.notes_text.edit_modified():
+            content = self.notes_text.get("1.0", tk.END)
+            self.notes_text.edit_modified(False)
+            self.notes_store.submit(content)
+        if silent:
+            return
+        if self.notes_store.flush():
+            self.status_var.set("Notes saved.")
+        else:
+            self.status_var.set("Failed to save notes.")
 
     def _load_notes(self):
-        if not NOTES_PATH.exists():
-            return
         try:
-            with open(NOTES_PATH, "r", encoding="utf-8") as f:
-                content = f.read()
-            self.notes_text.delete("1.0", tk.END)
-            self.notes_text.insert(tk.END, content)
+            content = self.notes_store.load()
         except Exception:
-            pass
+            return
+        if content is None:
+            return
+        self.notes_text.delete("1.0", tk.END)
+        self.notes_text.insert(tk.END, content)
+        self.notes_text.edit_modified(False)
 
     def _clear_notes(self):
         self.notes_text.delete("1.0", tk.END)
@@ -753,12 +1271,15 @@ Tips:
             self.after_cancel(self._notes_after_id)
         self._notes_after_id = self.after(5000, lambda: self._save_notes(silent=True))
 
+    def _on_close(self):
+        if self._notes_after_id is not None:
+            self.after_cancel(self._notes_after_id)
+            self._save_notes(silent=True)
+        self.notes_store.flush()
+        self.destroy()
+
     def _explain_code_snippet(self, code: str) -> str:
-        lower = code.lower()
-        matches = []
-        for key, desc in self.rulebook.items():
-            if key.lower() in lower:
-                matches.append(f"{key}: {desc}")
+        matches = [f"{key}: {self.rulebook[key]}" for key in self.rule_matcher.find(code)]
         if matches:
             return "\n".join(matches)
         return "No specific explanations found. Add it to the rulebook."
@@ -770,7 +1291,7 @@ Tips:
         file_menu.add_command(label="Open Rulebook", command=lambda: open_file(RULEBOOK_PATH))
         file_menu.add_command(label="Open Learning Plan", command=lambda: open_file(LEARNING_PLAN))
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.destroy)
+        file_menu.add_command(label="Exit", command=self._on_close)
         menubar.add_cascade(label="File", menu=file_menu)
 
         edit_menu = tk.Menu(menubar, tearoff=0)
@@ -786,6 +1307,12 @@ Tips:
 
 
 def main():
+    if "--kernel" in sys.argv[1:]:
+        kernel_main()
+        return
+    if "--command-server" in sys.argv[1:]:
+        command_server_main()
+        return
     app = UnifiedApp()
     app.mainloop()
 
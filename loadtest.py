@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Classroom Load Generator for the ACA Learning Platform
+Replays realistic learner sessions against a local server and reports
+throughput, latency percentiles and error rates per route
+
+Each session browses the index, opens a lesson, runs its starter code
+3-5 times and marks the lesson complete.
+
+Usage:
+    python loadtest.py --sessions 200 --concurrency 30 --rate 10
+    python loadtest.py --url http://127.0.0.1:5000 --sessions 50
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from app import LEARNING_PATHS
+
+LESSONS = [(path_id, lesson) for path_id, path in LEARNING_PATHS.items() for lesson in path['lessons']]
+
+
+def serve(progress_file, ready):
+    """Run the Flask app on a threaded WSGI server (child process)"""
+    from werkzeug.serving import make_server
+    import progress
+    from app import app
+
+    progress.PROGRESS_FILE = progress_file
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+class Stats:
+    """Thread-safe latency and error recorder keyed by route"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, elapsed_ms, ok):
+        with self.lock:
+            self.latencies[route].append(elapsed_ms)
+            if not ok:
+                self.errors[route] += 1
+
+
+def request(base_url, stats, route, method, url, payload=None, timeout=30):
+    """Issue one HTTP request and record its latency under route"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(base_url + url, data=data, method=method)
+    if data is not None:
+        req.add_header('Content-Type', 'application/json')
+    start = time.perf_counter()
+    ok = False
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            ok = resp.status < 400
+    except (urllib.error.URLError, OSError):
+        ok = False
+    stats.record(route, (time.perf_counter() - start) * 1000, ok)
+
+
+def learner_session(base_url, stats, think):
+    """One learner: index -> lesson -> run 3-5 times -> mark complete"""
+    rng = random.Random()
+    path_id, lesson = rng.choice(LESSONS)
+
+    def pause():
+        if think:
+            time.sleep(rng.uniform(0, 2 * think))
+
+    request(base_url, stats, 'GET /', 'GET', '/')
+    pause()
+    request(base_url, stats, 'GET /lesson/<p>/<l>', 'GET', f"/lesson/{path_id}/{lesson['id']}")
+    for attempt in range(rng.randint(3, 5)):
+        pause()
+        code = lesson['code'] + (f"\nprint('attempt {attempt}')\n" if attempt else '')
+        request(base_url, stats, 'POST /execute', 'POST', '/execute', {'code': code})
+    pause()
+    request(base_url, stats, 'POST /mark-complete/<p>/<l>', 'POST', f"/mark-complete/{path_id}/{lesson['id']}")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def report(stats, elapsed, sessions):
+    """Print the per-route summary table"""
+    total = sum(len(v) for v in stats.latencies.values())
+    total_errors = sum(stats.errors.values())
+    print("\n" + "=" * 86)
+    print(f"Sessions: {sessions}   Requests: {total}   Wall time: {elapsed:.2f}s")
+    print(f"Throughput: {total / elapsed:.1f} req/s, {sessions / elapsed:.2f} sessions/s   "
+          f"Errors: {total_errors} ({(total_errors / total if total else 0):.2%})")
+    print("=" * 86)
+    print(f"{'route':<30} {'count':>7} {'err%':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for route in sorted(stats.latencies):
+        values = sorted(stats.latencies[route])
+        err = stats.errors[route] / len(values)
+        print(f"{route:<30} {len(values):>7} {err:>7.2%} {percentile(values, 50):>9.1f} "
+              f"{percentile(values, 95):>9.1f} {percentile(values, 99):>9.1f} {values[-1]:>9.1f}")
+    return total_errors
+
+
+def run_load(base_url, sessions, concurrency, rate, think):
+    """Start sessions at the given arrival rate (0 = all at once) and wait for them"""
+    stats = Stats()
+    rng = random.Random()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(sessions):
+            pool.submit(learner_session, base_url, stats, think)
+            if rate > 0:
+                time.sleep(rng.expovariate(rate))
+    return stats, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay learner sessions against the learning platform')
+    parser.add_argument('--url', help='Target an already running server instead of starting one')
+    parser.add_argument('--sessions', type=int, default=100, help='Total learner sessions to run')
+    parser.add_argument('--concurrency', type=int, default=20, help='Maximum sessions in flight')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='Session arrival rate per second (Poisson); 0 starts them all at once')
+    parser.add_argument('--think', type=float, default=0.0, help='Mean think time between steps, in seconds')
+    args = parser.parse_args(argv)
+
+    server = None
+    tmp = None
+    base_url = args.url
+    if not base_url:
+        # Serve from a separate process so the load generator does not share its GIL
+        tmp = tempfile.TemporaryDirectory()
+        ready = multiprocessing.Queue()
+        server = multiprocessing.Process(
+            target=serve, args=(os.path.join(tmp.name, 'progress_data.json'), ready), daemon=True
+        )
+        server.start()
+        base_url = f"http://127.0.0.1:{ready.get(timeout=30)}"
+
+    print(f"Target: {base_url}   sessions={args.sessions} concurrency={args.concurrency} "
+          f"rate={args.rate or 'unlimited'}/s think={args.think}s")
+    try:
+        stats, elapsed = run_load(base_url, args.sessions, args.concurrency, args.rate, args.think)
+        errors = report(stats, elapsed, args.sessions)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        if tmp is not None:
+            tmp.cleanup()
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Operational Metrics
+Prometheus-style counters, gauges and histograms for the /metrics endpoint
+
+Counters and histograms write to a per-thread shard, so the hot path never
+takes a lock; shards are summed when the endpoint is scraped. Shards of
+threads that have exited are folded into a retired total so short-lived
+request threads do not accumulate.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_LIVE_SHARDS = 64
+
+REGISTRY = []
+
+
+class _Sharded:
+    """Base for metrics whose samples live in per-thread dicts"""
+
+    kind = ''
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                if len(self._shards) >= MAX_LIVE_SHARDS:
+                    self._fold_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_dead(self):
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                for labels, value in shard.items():
+                    self._merge(self._retired, labels, value)
+        self._shards = live
+
+    def _merge(self, into, labels, value):
+        raise NotImplementedError
+
+    def collect(self):
+        """Return {label values: aggregated value} across all threads"""
+        with self._lock:
+            self._fold_dead()
+            total = {}
+            for labels, value in self._retired.items():
+                self._merge(total, labels, value)
+            for _thread, shard in self._shards:
+                for labels, value in list(shard.items()):
+                    self._merge(total, labels, value)
+        return total
+
+    def _label_str(self, labels, extra=()):
+        pairs = list(zip(self.labelnames, labels)) + list(extra)
+        if not pairs:
+            return ''
+        inner = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return '{' + inner + '}'
+
+
+class Counter(_Sharded):
+    """Monotonic counter, optionally labelled"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=(), initial=()):
+        super().__init__(name, help_text, labelnames)
+        # Pre-create series so they are exported as 0 before the first event
+        for labels in initial:
+            self._retired[tuple(labels)] = 0
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, into, labels, value):
+        into[labels] = into.get(labels, 0) + value
+
+    def value(self, *labels):
+        return self.collect().get(labels, 0)
+
+    def render(self):
+        return [f'{self.name}{self._label_str(labels)} {_fmt(value)}'
+                for labels, value in sorted(self.collect().items())]
+
+
+class Histogram(_Sharded):
+    """Bucketed distribution of observed values (seconds by default)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        sample = shard.get(labels)
+        if sample is None:
+            sample = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        sample[bisect.bisect_left(self.buckets, value)] += 1
+        sample[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _merge(self, into, labels, value):
+        current = into.get(labels)
+        if current is None:
+            into[labels] = list(value)
+        else:
+            for i, v in enumerate(value):
+                current[i] += v
+
+    def render(self):
+        lines = []
+        for labels, sample in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), sample):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _fmt(bound)
+                lines.append(f'{self.name}_bucket{self._label_str(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{self._label_str(labels)} {_fmt(sample[-1])}')
+            lines.append(f'{self.name}_count{self._label_str(labels)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Value computed at scrape time by a callback
+
+    The callback returns a number, or a dict of {label values tuple: number}.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, func, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def render(self):
+        value = self.func()
+        if not isinstance(value, dict):
+            return [f'{self.name} {_fmt(value)}']
+        lines = []
+        for labels, v in sorted(value.items()):
+            inner = ','.join(f'{k}="{_escape(l)}"' for k, l in zip(self.labelnames, labels))
+            lines.append(f'{self.name}{{{inner}}} {_fmt(v)}')
+        return lines
+
+
+def render():
+    """Text exposition format for every registered metric"""
+    out = []
+    for metric in REGISTRY:
+        out.append(f'# HELP {metric.name} {metric.help}')
+        out.append(f'# TYPE {metric.name} {metric.kind}')
+        out.extend(metric.render())
+    return '\n'.join(out) + '\n'
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return repr(round(value, 9))
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
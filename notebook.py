@@ -0,0 +1,452 @@
+"""
+Notebook Cells
+Splits a program into cells and re-runs only what an edit affects
+
+Cells come from `# %%` marker lines, or else one per top-level statement.
+The AST gives each cell the names it defines and the names it reads;
+calling a method on a name, or assigning into it, counts as redefining it
+(the object may have changed). So does calling a function that assigns
+or mutates that global, or that mutates an argument it is passed. After
+an edit, the changed cells and every cell downstream that reads
+something they define run again. All other cells are skipped, and their
+names are restored from snapshots taken when they last ran.
+
+This module only plans and bookkeeps; the caller supplies run_cell, so the
+session worker keeps the namespace inside the sandbox process.
+"""
+
+import ast
+import copy
+import time
+import types
+
+CELL_MARKER = '# %%'
+
+
+class Cell:
+    """One cell's source, where it starts, and what it touches"""
+
+    __slots__ = ('source', 'line', 'defines', 'reads', 'functions', 'passes', 'result', 'snapshot', 'shared')
+
+    def __init__(self, source, line):
+        self.source = source
+        self.line = line
+        self.defines, self.reads, self.functions, self.passes = analyze(source)
+        self.result = None     # last run's result, None until it succeeds
+        self.snapshot = {}     # name -> value right after the cell ran
+        self.shared = set()    # snapshot names that could not be copied
+
+
+def split_cells(source):
+    """(source, first line) per cell"""
+    lines = source.splitlines(keepends=True)
+    if any(line.strip().startswith(CELL_MARKER) for line in lines):
+        cells, start = [], 0
+        for i, line in enumerate(lines):
+            if line.strip().startswith(CELL_MARKER):
+                if ''.join(lines[start:i]).strip():
+                    cells.append((''.join(lines[start:i]), start + 1))
+                start = i
+        if ''.join(lines[start:]).strip():
+            cells.append((''.join(lines[start:]), start + 1))
+        return cells
+    try:
+        body = ast.parse(source).body
+    except SyntaxError:
+        return [(source, 1)]
+    cells, start = [], 0
+    for node in body:
+        # Comments and blank lines above a statement belong to it
+        end = node.end_lineno
+        cells.append((''.join(lines[start:end]), start + 1))
+        start = end
+    if cells and start < len(lines):
+        last, line = cells[-1]
+        cells[-1] = (last + ''.join(lines[start:]), line)
+    return cells or [(source, 1)]
+
+
+def analyze(source):
+    """(defines, reads, functions, passes) for one cell's top level
+
+    functions maps each function or class the cell defines to its
+    Effects, so a cell calling it depends on (and changes) what it does.
+    passes maps each name the cell calls to the names handed to it as
+    arguments. Unparseable cells return None for defines and reads.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None, None, {}, {}
+    visitor = _TopLevel()
+    for node in tree.body:
+        visitor.visit(node)
+    return visitor.defines, visitor.reads, visitor.functions, visitor.passes
+
+
+class Effects:
+    """What calling a function does to the globals
+
+    reads: globals its body loads. writes: globals it rebinds (through
+    `global`) or mutates. passes: callee -> globals it hands to other
+    functions as arguments. mutates_args: whether it changes an object
+    passed in, which makes the caller's arguments writes too.
+    """
+
+    __slots__ = ('reads', 'writes', 'passes', 'mutates_args')
+
+    def __init__(self, reads, writes, passes, mutates_args):
+        self.reads = reads
+        self.writes = writes
+        self.passes = passes
+        self.mutates_args = mutates_args
+
+    def __or__(self, other):
+        passes = {name: set(names) for name, names in self.passes.items()}
+        for name, names in other.passes.items():
+            passes.setdefault(name, set()).update(names)
+        return Effects(self.reads | other.reads, self.writes | other.writes, passes,
+                       self.mutates_args or other.mutates_args)
+
+
+class _TopLevel(ast.NodeVisitor):
+    """Names bound and loaded by code that runs when the cell runs"""
+
+    def __init__(self):
+        self.defines = set()
+        self.reads = set()
+        self.functions = {}
+        self.passes = {}
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.reads.add(node.id)
+        else:
+            self.defines.add(node.id)
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.target, ast.Name):
+            self.reads.add(node.target.id)
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self._mutates(node)
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self._mutates(node)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Attribute):
+            self._mutates(node.func)
+        elif isinstance(node.func, ast.Name):
+            self.passes.setdefault(node.func.id, set()).update(_argument_names(node))
+        self.generic_visit(node)
+
+    def _mutates(self, node):
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+        if isinstance(node, ast.Name):
+            self.defines.add(node.id)
+
+    def visit_FunctionDef(self, node):
+        self.defines.add(node.name)
+        for expr in node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d]:
+            self.visit(expr)
+        self.functions[node.name] = _effects(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.defines.add(node.name)
+        for expr in node.decorator_list + node.bases + [k.value for k in node.keywords]:
+            self.visit(expr)
+        methods = Effects(set(), set(), {}, False)
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                # self is the instance being built or called on, not an argument
+                methods |= _effects(item, bound=True)
+            else:
+                self.visit(item)
+        self.functions[node.name] = methods
+
+    def visit_Lambda(self, node):
+        for expr in node.args.defaults:
+            self.visit(expr)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.defines.add((alias.asname or alias.name).split('.')[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != '*':
+                self.defines.add(alias.asname or alias.name)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.defines.add(node.name)
+        self.generic_visit(node)
+
+
+def _argument_names(call):
+    return {arg.id for arg in call.args + [k.value for k in call.keywords] if isinstance(arg, ast.Name)}
+
+
+def _effects(func, bound=False):
+    """Effects of calling func, judged from its body
+
+    A local that may alias a global (assigned from an expression reading
+    one) and is then mutated could be changing anything the body refers
+    to, so every global it reads counts as written.
+    """
+    args = func.args
+    params = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+    params += [a.arg for a in (args.vararg, args.kwarg) if a]
+    if bound and params:
+        params = params[1:]
+    local = {a.arg for a in args.posonlyargs + args.args + args.kwonlyargs}
+    local |= {a.arg for a in (args.vararg, args.kwarg) if a}
+    loads, declared, stored = set(), set(), set()
+    for node in ast.walk(func):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loads.add(node.id)
+            else:
+                stored.add(node.id)
+        elif isinstance(node, ast.Global):
+            declared.update(node.names)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node is not func:
+            local.add(node.name)
+    local = (local | stored) - declared
+    reads = (loads - local) | declared
+
+    aliases = set()
+    for node in ast.walk(func):
+        if isinstance(node, (ast.Assign, ast.AnnAssign, ast.NamedExpr)) and node.value is not None:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if any(isinstance(n, ast.Name) and n.id not in local for n in ast.walk(node.value)):
+                aliases |= {n.id for t in targets for n in ast.walk(t) if isinstance(n, ast.Name)} & local
+
+    writes = stored & declared
+    passes = {}
+    mutates_args = False
+    for node in ast.walk(func):
+        target = None
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Attribute):
+                target = node.func
+            elif isinstance(node.func, ast.Name):
+                passed = _argument_names(node) - local
+                if passed:
+                    passes.setdefault(node.func.id, set()).update(passed)
+        elif isinstance(node, (ast.Attribute, ast.Subscript)) and not isinstance(node.ctx, ast.Load):
+            target = node
+        while isinstance(target, (ast.Attribute, ast.Subscript)):
+            target = target.value
+        if not isinstance(target, ast.Name):
+            continue
+        if target.id not in local:
+            writes.add(target.id)
+        elif target.id in params:
+            mutates_args = True
+        elif target.id in aliases:
+            writes |= reads
+    return Effects(reads, writes, passes, mutates_args)
+
+
+class Notebook:
+    """Cells from the last run, their snapshots and the live namespace"""
+
+    def __init__(self):
+        self.cells = []
+        self.namespace = {}
+        # name -> snapshot dict its live value came from (None: unknown)
+        self._holder = {}
+
+    def plan(self, sources):
+        """New cell list, the indexes that must run, and names left orphaned
+
+        Unchanged leading and trailing cells keep their state; everything
+        between them is new, and so is anything that reads what new or
+        removed cells define.
+        """
+        old = self.cells
+        new = [Cell(source, line) for source, line in sources]
+        for i, cell in enumerate(new):
+            if cell.defines is not None:
+                cell.defines = cell.defines | self._writes(new, i)
+        prefix = 0
+        while prefix < min(len(old), len(new)) and old[prefix].source == new[prefix].source:
+            prefix += 1
+        suffix = 0
+        while (suffix < min(len(old), len(new)) - prefix
+               and old[-1 - suffix].source == new[-1 - suffix].source):
+            suffix += 1
+        for i in list(range(prefix)) + list(range(len(new) - suffix, len(new))):
+            kept = old[i] if i < prefix else old[i - len(new) + len(old)]
+            new[i].result, new[i].snapshot, new[i].shared = kept.result, kept.snapshot, kept.shared
+
+        removed = set()
+        for cell in old[prefix:len(old) - suffix]:
+            removed |= cell.defines or set()
+        dirty = set(range(prefix, len(new) - suffix))
+        changed = True
+        while changed:
+            changed = False
+            touched = set()
+            for i, cell in enumerate(new):
+                if i == prefix:
+                    touched |= removed
+                if i not in dirty and (cell.result is None or cell.defines is None or self._reads(new, i) & touched):
+                    dirty.add(i)
+                    changed = True
+                if i in dirty:
+                    if cell.defines is None:
+                        # Unknown effects: everything after it runs again
+                        dirty.update(range(i, len(new)))
+                        break
+                    touched |= cell.defines
+                    # A value that could not be copied is only trustworthy if
+                    # its own cell runs again
+                    for name in self._needs(new, i):
+                        owner = self._owner(new, i, name)
+                        if owner is not None and owner not in dirty and name in new[owner].shared:
+                            dirty.add(owner)
+                            changed = True
+        return new, sorted(dirty), removed
+
+    def run(self, source, run_cell, time_limit):
+        """Run what changed; one result per cell, cached or fresh
+
+        run_cell(code, namespace, time_limit) returns a run_code-style
+        result. A failing cell stops the run, as it would a whole program,
+        and the cells after it are reported as not run.
+        """
+        cells, dirty, removed = self.plan(split_cells(source))
+        dirty = set(dirty)
+        # A fresh run never sees what removed cells defined
+        for name in removed:
+            self.namespace.pop(name, None)
+            self._holder.pop(name, None)
+        deadline = time.monotonic() + time_limit
+        results = []
+        stopped = False
+        for i, cell in enumerate(cells):
+            if stopped:
+                cell.result = None
+                results.append({'line': cell.line, 'ran': False, 'outcome': 'skipped', 'output': ''})
+                continue
+            if i not in dirty:
+                results.append(dict(cell.result, line=cell.line, ran=False))
+                continue
+            for name in self._needs(cells, i):
+                self._restore(cells, i, name, dirty)
+            code = '\n' * (cell.line - 1) + cell.source   # tracebacks keep real line numbers
+            result = run_cell(code, self.namespace, max(deadline - time.monotonic(), 0.001))
+            record = {'outcome': result['outcome'], 'output': result['output']}
+            results.append(dict(record, line=cell.line, ran=True))
+            if result['outcome'] in ('success', 'truncated'):
+                cell.result = record
+                self._take_snapshot(cell)
+            else:
+                cell.result = None
+                cell.snapshot = {}
+                stopped = True
+            for name in cell.defines or ():
+                self._holder[name] = cell.snapshot if cell.result is not None else None
+        self.cells = cells
+        # Leave every name as the whole program would have left it
+        final = set()
+        for cell in cells:
+            final |= cell.defines or set()
+        for name in removed - final:
+            self.namespace.pop(name, None)
+            self._holder.pop(name, None)
+        for name in final:
+            self._restore(cells, len(cells), name, dirty)
+        return results
+
+    @staticmethod
+    def _owner(cells, i, name):
+        for j in range(i - 1, -1, -1):
+            if cells[j].defines and name in cells[j].defines:
+                return j
+        return None
+
+    def _reads(self, cells, i):
+        """What cell i reads, including globals of the functions it calls"""
+        reads = set(cells[i].reads or ())
+        pending = list(reads)
+        while pending:
+            effects = self._function(cells, i, pending.pop())
+            for extra in (effects.reads if effects is not None else ()):
+                if extra not in reads:
+                    reads.add(extra)
+                    pending.append(extra)
+        return reads
+
+    def _writes(self, cells, i):
+        """Globals the functions cell i calls (directly or not) rebind or mutate"""
+        writes = set()
+        passes = {name: set(names) for name, names in cells[i].passes.items()}
+        for name in self._reads(cells, i):
+            effects = self._function(cells, i, name)
+            if effects is not None:
+                writes |= effects.writes
+                for callee, names in effects.passes.items():
+                    passes.setdefault(callee, set()).update(names)
+        for callee, names in passes.items():
+            effects = self._function(cells, i, callee)
+            if effects is not None and effects.mutates_args:
+                writes |= names
+        return writes
+
+    def _function(self, cells, i, name):
+        """Effects of the function or class name refers to before cell i, or None"""
+        owner = self._owner(cells, i, name)
+        return cells[owner].functions.get(name) if owner is not None else None
+
+    def _needs(self, cells, i):
+        return self._reads(cells, i) | (cells[i].defines or set())
+
+    def _restore(self, cells, i, name, dirty):
+        """Put name back to its value just before cell i"""
+        owner = self._owner(cells, i, name)
+        if owner is None:
+            if (any(name in (cell.defines or ()) for cell in cells)
+                    and all(cell.defines is not None for cell in cells[:i])):
+                # Only later cells define it: a fresh run has no value yet
+                self.namespace.pop(name, None)
+                self._holder.pop(name, None)
+            return   # otherwise a builtin or never defined
+        if owner in dirty:
+            return   # already live from this run
+        snapshot = cells[owner].snapshot
+        if self._holder.get(name) is snapshot and name in self.namespace:
+            return   # untouched since that cell ran
+        self._holder[name] = snapshot
+        if name not in snapshot:
+            self.namespace.pop(name, None)
+        elif name in cells[owner].shared:
+            self.namespace[name] = snapshot[name]
+        else:
+            self.namespace[name] = copy.deepcopy(snapshot[name])
+
+    def _take_snapshot(self, cell):
+        cell.snapshot, cell.shared = {}, set()
+        for name in cell.defines:
+            if name not in self.namespace:
+                continue
+            value = self.namespace[name]
+            if isinstance(value, types.ModuleType):
+                cell.snapshot[name] = value
+                continue
+            try:
+                cell.snapshot[name] = copy.deepcopy(value)
+            except Exception:
+                cell.snapshot[name] = value
+                cell.shared.add(name)
@@ -3,32 +3,85 @@ Progress Tracking System
 Handles lesson completion storage and retrieval
 """
 
+import copy
 import json
 import os
+import threading
 from datetime import datetime
 
+from metrics import Counter, Gauge, Histogram
+from tracing import current_span, traced
+
 PROGRESS_FILE = 'progress_data.json'
 
-def load_progress():
-    """Load progress data from file"""
-    if os.path.exists(PROGRESS_FILE):
+PROGRESS_IO_SECONDS = Histogram(
+    'aca_progress_io_seconds', 'Progress store read/write latency', ('op',)
+)
+PROGRESS_CACHE = Counter(
+    'aca_progress_cache_total', 'Progress reads served from cache (hit) or disk (miss)',
+    ('result',), initial=[('hit',), ('miss',)]
+)
+
+# Parsed progress keyed by (path, mtime_ns, size) of the file it came from
+_cache = {'key': None, 'data': {}}
+_cache_lock = threading.Lock()
+
+def _cache_hit_ratio():
+    hits, misses = PROGRESS_CACHE.value('hit'), PROGRESS_CACHE.value('miss')
+    return hits / (hits + misses) if hits + misses else 0.0
+
+Gauge('aca_progress_cache_hit_ratio', 'Fraction of progress reads served from cache', _cache_hit_ratio)
+
+def _count_cache(result):
+    PROGRESS_CACHE.inc(result)
+    span = current_span()
+    if span is not None:
+        span.set(cache=result)
+
+@traced('progress.read')
+def _read_progress():
+    """Parsed progress data, shared with the cache - callers must not mutate it"""
+    try:
+        st = os.stat(PROGRESS_FILE)
+    except OSError:
+        return {}
+    key = (PROGRESS_FILE, st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        if _cache['key'] == key:
+            _count_cache('hit')
+            return _cache['data']
+    _count_cache('miss')
+    with PROGRESS_IO_SECONDS.time('read'):
         try:
             with open(PROGRESS_FILE, 'r') as f:
-                return json.load(f)
+                data = json.load(f)
         except:
-            return {}
-    return {}
+            data = {}
+    with _cache_lock:
+        _cache['key'] = key
+        _cache['data'] = data
+    return data
 
+def load_progress():
+    """Load progress data from file"""
+    return copy.deepcopy(_read_progress())
+
+@traced('progress.write')
 def save_progress(data):
     """Save progress data to file"""
     try:
-        with open(PROGRESS_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        with PROGRESS_IO_SECONDS.time('write'):
+            with open(PROGRESS_FILE, 'w') as f:
+                json.dump(data, f, indent=2)
         return True
     except Exception as e:
         print(f"Error saving progress: {e}")
         return False
+    finally:
+        with _cache_lock:
+            _cache['key'] = None
 
+@traced('progress.mark_complete')
 def mark_complete(path_id, lesson_id):
     """Mark a lesson as complete"""
     progress = load_progress()
@@ -46,13 +99,15 @@ def mark_complete(path_id, lesson_id):
     save_progress(progress)
     return progress
 
+@traced('progress.get_completed')
 def get_completed(path_id):
     """Get all completed lessons for a path"""
-    progress = load_progress()
+    progress = _read_progress()
     if path_id in progress:
-        return progress[path_id]['completed']
+        return list(progress[path_id]['completed'])
     return []
 
+@traced('progress.get_progress')
 def get_progress(path_id, total_lessons):
     """Get progress percentage for a path"""
     completed = get_completed(path_id)
@@ -66,11 +121,13 @@ def get_progress(path_id, total_lessons):
         'lessons': completed
     }
 
+@traced('progress.is_complete')
 def is_complete(path_id, lesson_id):
     """Check if a lesson is complete"""
     completed = get_completed(path_id)
     return lesson_id in completed
 
+@traced('progress.get_all_progress')
 def get_all_progress():
     """Get all progress data"""
     return load_progress()
@@ -79,4 +136,6 @@ def clear_progress():
     """Clear all progress"""
     if os.path.exists(PROGRESS_FILE):
         os.remove(PROGRESS_FILE)
+    with _cache_lock:
+        _cache['key'] = None
     return True
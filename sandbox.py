@@ -0,0 +1,891 @@
+"""
+Code Execution Sandbox
+Runs learner code with restricted builtins, a time limit and optional profiling
+
+open() works on a per-run in-memory filesystem (vfs.py), never the disk.
+import serves only allowlisted modules, loaded once per worker.
+Attributes that lead back to real globals, builtins or frames are refused
+when the code is compiled. None of this is a security boundary: run
+untrusted code in process workers under OS-level isolation as well.
+"""
+
+import ast
+import builtins
+import importlib
+import json
+import os
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+import types
+from contextlib import contextmanager, nullcontext
+
+import notebook
+import vfs
+
+TIME_LIMIT_SECONDS = 5.0
+MAX_CODE_LENGTH = 10000
+MAX_OUTPUT_CHARS = 100000
+SOURCE_NAME = '<learner>'
+# Builtin called at the top of every except/finally block in learner code
+DEADLINE_CHECK = '__deadline__'
+
+# Profile payload limits, keeping the /execute response compact
+PROFILE_MAX_LINES = 25
+PROFILE_MAX_FUNCTIONS = 25
+PROFILE_MAX_STACKS = 200
+PROFILE_MAX_DEPTH = 40
+
+SAFE_BUILTINS = {
+    'print': print,
+    'range': range,
+    'len': len,
+    'str': str,
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'list': list,
+    'dict': dict,
+    'tuple': tuple,
+    'set': set,
+    'abs': abs,
+    'max': max,
+    'min': min,
+    'sum': sum,
+    'sorted': sorted,
+    'enumerate': enumerate,
+    'zip': zip,
+    # Needed by class statements (classes_oop, lab TaskManager examples)
+    '__build_class__': builtins.__build_class__,
+}
+
+# Attributes learner code may not name: they reach the real module globals
+# behind a function, the builtins module behind a builtin, the class graph
+# (object.__subclasses__()) and frames (f_globals, f_back). str.format and
+# format_map are here too: their fields look attributes up from a string
+# ("{0.__globals__}"), out of this check's sight
+BLOCKED_ATTRIBUTES = frozenset({
+    'format', 'format_map',
+    '__globals__', '__code__', '__closure__', '__defaults__', '__kwdefaults__', '__builtins__',
+    '__self__', '__func__', '__wrapped__', '__dict__', '__getattribute__', '__reduce__', '__reduce_ex__',
+    '__subclasses__', '__bases__', '__base__', '__mro__', 'mro', '__traceback__',
+    'gi_frame', 'gi_code', 'cr_frame', 'cr_code', 'ag_frame', 'ag_code', 'tb_frame', 'tb_next',
+    'f_globals', 'f_locals', 'f_builtins', 'f_back', 'f_code',
+})
+# Names learner code may not use, so it cannot shadow or replace the check
+BLOCKED_NAMES = frozenset({'__builtins__', DEADLINE_CHECK})
+# What to use instead, added to the error for a blocked name
+BLOCKED_HINTS = {'format': 'use an f-string instead', 'format_map': 'use an f-string instead'}
+
+
+# Modules learner code may import (ACA_ALLOWED_MODULES, comma-separated).
+# os is always the virtual one from vfs.py; the others are loaded once by
+# preload_modules() and served as copies holding only their public names.
+DEFAULT_ALLOWED_MODULES = (
+    'math,cmath,random,statistics,decimal,fractions,json,datetime,calendar,collections,'
+    'itertools,functools,operator,string,re,heapq,bisect,copy,textwrap,dataclasses,enum,os'
+)
+ALLOWED_MODULES = tuple(
+    name.strip() for name in os.environ.get('ACA_ALLOWED_MODULES', DEFAULT_ALLOWED_MODULES).split(',') if name.strip()
+)
+VIRTUAL_MODULES = {'os': vfs.os_module}
+# Public names left out of the module copies: they look attributes up by
+# string, past the BLOCKED_ATTRIBUTES check
+HIDDEN_NAMES = {
+    'operator': ('attrgetter', 'methodcaller'),
+    'string': ('Formatter',),
+}
+
+_modules = None
+
+
+class ExecutionTimeout(BaseException):
+    """Raised inside learner code once its time limit has passed
+
+    Derives from BaseException so `except Exception` in learner code
+    does not swallow it.
+    """
+
+
+class ExecutionCancelled(ExecutionTimeout):
+    """Raised inside learner code when its run is cancelled early"""
+
+
+class CancelToken:
+    """Lets another thread stop a run: its client left or a newer run replaced it"""
+
+    def __init__(self):
+        self.cancelled = False
+        self.reason = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self, reason='cancelled'):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    @contextmanager
+    def bind(self, callback):
+        """Call callback if the token is cancelled inside the block, never after it
+
+        Runs it straight away if the token is already cancelled.
+        """
+        guard = threading.Lock()
+        live = [True]
+
+        def guarded():
+            with guard:
+                if live[0]:
+                    callback()
+
+        with self._lock:
+            pending = not self.cancelled
+            if pending:
+                self._callbacks.append(guarded)
+        if not pending:
+            guarded()
+        try:
+            yield self
+        finally:
+            with guard:
+                live[0] = False
+            with self._lock:
+                if guarded in self._callbacks:
+                    self._callbacks.remove(guarded)
+
+
+def _raise_in_thread(thread_id, exc_type):
+    """Schedule exc_type to be raised in another thread of this interpreter"""
+    # Imported here: ctypes cannot load in an isolated subinterpreter, which
+    # uses MonitoringDeadline instead
+    import ctypes
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(exc_type))
+
+
+class Watchdog:
+    """One background thread that enforces every run's time limit
+
+    An overrunning run gets ExecutionTimeout raised asynchronously in its
+    thread, and again every REFIRE_SECONDS. A bare `except:` could swallow
+    each one, so every except and finally block in learner code starts
+    with check(), which raises it again once the run is overdue (see
+    guard_handlers). Learner code pays nothing per line; only a blocking
+    C call (a huge sum(), a sleep) can outlast the limit until it returns.
+    The exception is only raised while the thread is inside learner code,
+    so it cannot land in the server code around a run.
+    """
+
+    REFIRE_SECONDS = 0.1
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._thread = None
+        self._overdue = {}   # thread id -> entry whose exception has been raised
+
+    def watch(self, time_limit):
+        """Start timing the calling thread; pass the result to release()"""
+        deadline = time.monotonic() + time_limit
+        entry = {
+            'thread_id': threading.get_ident(), 'done': False, 'deadline': deadline, 'paused': False,
+            'exc': ExecutionTimeout,
+        }
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._seq), entry))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sandbox-watchdog', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return entry
+
+    def release(self, entry):
+        """Stop timing the run
+
+        A timeout fired just before this call is delivered at the latest in
+        Condition.__exit__ (a Python-level call) and absorbed here.
+        """
+        while True:
+            try:
+                with self._cond:
+                    entry['done'] = True
+                    if self._overdue.get(entry['thread_id']) is entry:
+                        del self._overdue[entry['thread_id']]
+                return
+            except ExecutionTimeout:
+                continue
+
+    def check(self):
+        """Raise the calling thread's timeout (or cancellation) again if it is overdue"""
+        entry = self._overdue.get(threading.get_ident())
+        if entry is not None and not entry['done']:
+            raise entry['exc']
+
+    def cancel(self, entry):
+        """Stop the run now with ExecutionCancelled, even while paused"""
+        with self._cond:
+            if entry['done']:
+                return
+            entry['exc'] = ExecutionCancelled
+            entry['deadline'] = time.monotonic()
+            entry['paused'] = False
+            heapq.heappush(self._heap, (entry['deadline'], next(self._seq), entry))
+            self._cond.notify()
+
+    @contextmanager
+    def paused(self, entry):
+        """Stop the clock while the run waits on the learner (input())
+
+        The deadline moves back by the time spent inside the block.
+        """
+        start = time.monotonic()
+        with self._cond:
+            entry['paused'] = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                entry['deadline'] += time.monotonic() - start
+                entry['paused'] = False
+
+    def _run(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2]['done']:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, _, entry = heapq.heappop(self._heap)
+                now = time.monotonic()
+                if entry['paused'] or entry['deadline'] > now:
+                    # Paused or pushed back: look again at the later of the two
+                    heapq.heappush(self._heap, (max(entry['deadline'], now + self.REFIRE_SECONDS), next(self._seq), entry))
+                    continue
+                self._overdue[entry['thread_id']] = entry
+                # Not yet in (or already past) exec: check again shortly
+                if _in_learner_code(entry['thread_id']):
+                    _raise_in_thread(entry['thread_id'], entry['exc'])
+                heapq.heappush(self._heap, (time.monotonic() + self.REFIRE_SECONDS, next(self._seq), entry))
+
+
+def _in_learner_code(thread_id):
+    frame = sys._current_frames().get(thread_id)
+    while frame is not None:
+        if frame.f_code.co_filename == SOURCE_NAME:
+            return True
+        frame = frame.f_back
+    return False
+
+
+WATCHDOG = Watchdog()
+
+
+class MonitoringDeadline:
+    """Time limit for learner code via sys.monitoring (Python 3.12+)
+
+    Used inside subinterpreter workers, where the watchdog's async
+    exceptions are unavailable. Loop jumps and function starts in the
+    submission's own code objects are instrumented, but each location
+    disables itself after one check, so learner code runs at full speed.
+    At the deadline a timer re-enables every location, and the next jump
+    or call raises ExecutionTimeout.
+    """
+
+    TOOL_ID = 4
+
+    def __init__(self, time_limit):
+        self.deadline = time.perf_counter() + time_limit
+        self._timer = threading.Timer(time_limit, sys.monitoring.restart_events)
+
+    def instrument(self, compiled):
+        monitoring = sys.monitoring
+        if monitoring.get_tool(self.TOOL_ID) is None:
+            monitoring.use_tool_id(self.TOOL_ID, 'aca-deadline')
+        events = monitoring.events.JUMP | monitoring.events.PY_START
+        monitoring.register_callback(self.TOOL_ID, monitoring.events.JUMP, self._check)
+        monitoring.register_callback(self.TOOL_ID, monitoring.events.PY_START, self._check)
+        stack = [compiled]
+        while stack:
+            code = stack.pop()
+            monitoring.set_local_events(self.TOOL_ID, code, events)
+            stack.extend(c for c in code.co_consts if hasattr(c, 'co_code'))
+        self._timer.start()
+
+    def cancel(self):
+        self._timer.cancel()
+        if self._timer.is_alive():
+            self._timer.join()
+
+    def _check(self, *args):
+        if time.perf_counter() > self.deadline:
+            raise ExecutionTimeout
+        return sys.monitoring.DISABLE
+
+
+class Profiler:
+    """Deterministic per-line and per-function profiler for learner code
+
+    Only frames compiled from SOURCE_NAME are traced. Line times are self
+    times: a line that calls a learner function is not charged for the
+    callee's lines, so the line column sums to the run time. Function
+    totals count only the outermost call of a recursive function.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.lines = {}      # lineno -> [hits, seconds]
+        self.functions = {}  # (name, firstlineno) -> [calls, total, self]
+        self.stacks = {}     # tuple of function names -> self seconds
+        self._frames = []    # [key, start, child_seconds, last_line, last_time]
+        self._active = {}    # key -> frames of it currently on the stack
+
+    def global_trace(self, frame, event, arg):
+        if frame.f_code.co_filename != SOURCE_NAME:
+            return None
+        now = time.perf_counter()
+        if self._frames:
+            self._charge_line(self._frames[-1], now)
+        code = frame.f_code
+        key = (getattr(code, 'co_qualname', code.co_name), code.co_firstlineno)
+        self._active[key] = self._active.get(key, 0) + 1
+        self._frames.append([key, now, 0.0, None, now])
+        return self.local_trace
+
+    def local_trace(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == 'line':
+            entry = self._frames[-1]
+            self._charge_line(entry, now)
+            entry[3] = frame.f_lineno
+            self.lines.setdefault(frame.f_lineno, [0, 0.0])[0] += 1
+        elif event == 'return':
+            self._pop(now)
+        return self.local_trace
+
+    def _charge_line(self, entry, now):
+        if entry[3] is not None:
+            self.lines[entry[3]][1] += now - entry[4]
+        entry[4] = now
+
+    def _pop(self, now):
+        entry = self._frames[-1]
+        self._charge_line(entry, now)
+        path = tuple(e[0][0] for e in self._frames[:PROFILE_MAX_DEPTH])
+        self._frames.pop()
+        key = entry[0]
+        total = now - entry[1]
+        own = total - entry[2]
+        self._active[key] -= 1
+        stats = self.functions.setdefault(key, [0, 0.0, 0.0])
+        stats[0] += 1
+        if not self._active[key]:
+            stats[1] += total
+        stats[2] += own
+        self.stacks[path] = self.stacks.get(path, 0.0) + own
+        if self._frames:
+            self._frames[-1][2] += total
+            self._frames[-1][4] = now
+
+    def finish(self):
+        """Close frames left open by a timeout or a disabled trace"""
+        now = time.perf_counter()
+        while self._frames:
+            self._pop(now)
+
+    def report(self, source):
+        """Compact JSON-ready timing tables"""
+        self.finish()
+        source_lines = source.splitlines()
+        ms = lambda seconds: round(seconds * 1000, 3)
+
+        lines = sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)[:PROFILE_MAX_LINES]
+        functions = sorted(self.functions.items(), key=lambda item: item[1][1], reverse=True)[:PROFILE_MAX_FUNCTIONS]
+        stacks = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)[:PROFILE_MAX_STACKS]
+        return {
+            'total_ms': ms(time.perf_counter() - self.start),
+            'lines': [
+                {
+                    'line': lineno,
+                    'hits': hits,
+                    'time_ms': ms(seconds),
+                    'source': source_lines[lineno - 1].strip() if 0 < lineno <= len(source_lines) else '',
+                }
+                for lineno, (hits, seconds) in sorted(lines)
+            ],
+            'functions': [
+                {'name': name, 'line': line, 'calls': calls, 'total_ms': ms(total), 'self_ms': ms(own)}
+                for (name, line), (calls, total, own) in functions
+            ],
+            'flame': [{'stack': list(path), 'self_ms': ms(seconds)} for path, seconds in stacks],
+        }
+
+
+class OutputCapture:
+    """Per-run stdout: a bounded text buffer the sandbox print writes to
+
+    Each run gets its own, so concurrent runs on a threaded server never
+    share or swap sys.stdout. Text past the limit is dropped and the run
+    is reported as truncated.
+    """
+
+    def __init__(self, limit=MAX_OUTPUT_CHARS):
+        self.limit = limit
+        self.truncated = False
+        self._parts = []
+        self._size = 0
+
+    def write(self, text):
+        if self.truncated:
+            return len(text)
+        room = self.limit - self._size
+        if len(text) > room:
+            self.truncated = True
+            text = text[:room]
+        self._parts.append(text)
+        self._size += len(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(self._parts)
+
+
+def _make_print(stream):
+    """print() bound to one run's output stream"""
+    def sandbox_print(*args, sep=' ', end='\n', file=None, flush=False):
+        builtins.print(*args, sep=sep, end=end, file=stream if file is None else file)
+    return sandbox_print
+
+
+def _make_input(stream, read_line, watch):
+    """input() that asks read_line for the learner's reply
+
+    read_line(stream) returns the line, or None for end of input. The time
+    limit is paused while waiting.
+    """
+    def sandbox_input(prompt=''):
+        stream.write(str(prompt))
+        if watch is None:
+            line = read_line(stream)
+        else:
+            with WATCHDOG.paused(watch):
+                line = read_line(stream)
+        if line is None:
+            raise EOFError('EOF when reading a line')
+        return line
+    return sandbox_input
+
+
+def preload_modules():
+    """Import the allowlist once; later calls are free
+
+    Modules that fail to import (some C extensions refuse isolated
+    subinterpreters) are left out.
+    """
+    global _modules
+    if _modules is not None:
+        return _modules
+    loaded = {}
+    for name in sorted(ALLOWED_MODULES, key=lambda n: n.count('.')):
+        if name.partition('.')[0] in VIRTUAL_MODULES:
+            continue
+        try:
+            loaded[name] = _public_copy(importlib.import_module(name))
+        except ImportError:
+            continue
+        parent, _, child = name.rpartition('.')
+        if parent in loaded:
+            setattr(loaded[parent], child, loaded[name])
+    _modules = loaded
+    return loaded
+
+
+def _public_copy(module):
+    """New module object with module's public names, minus the modules it imported"""
+    copy = types.ModuleType(module.__name__, module.__doc__)
+    hidden = HIDDEN_NAMES.get(module.__name__, ())
+    for key, value in vars(module).items():
+        if not key.startswith('_') and not isinstance(value, types.ModuleType) and key not in hidden:
+            setattr(copy, key, value)
+    return copy
+
+
+def _make_import(fs):
+    """__import__ that serves preloaded modules, and os backed by fs
+
+    Each run gets its own module objects, copied on first import, so a
+    run that assigns math.sqrt cannot change what other runs import.
+    """
+    modules = preload_modules()
+    virtual = {}
+    owned = {}
+
+    def own(name):
+        if name not in owned:
+            shared = modules.get(name)
+            if shared is None:
+                return None
+            module = owned[name] = types.ModuleType(shared.__name__, shared.__doc__)
+            for key, value in vars(shared).items():
+                if isinstance(value, types.ModuleType):
+                    value = own(f'{name}.{key}')
+                setattr(module, key, value)
+        return owned[name]
+
+    def sandbox_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level:
+            raise ImportError('Relative imports are not available in the sandbox')
+        top = name.partition('.')[0]
+        if top in VIRTUAL_MODULES and top in ALLOWED_MODULES:
+            if top not in virtual:
+                virtual[top] = VIRTUAL_MODULES[top](fs)
+            module = virtual[top]
+        else:
+            module = own(top)
+        leaf = module
+        for part in name.split('.')[1:]:
+            leaf = getattr(leaf, part, None)
+        if leaf is None:
+            raise ModuleNotFoundError(f"No module named '{name}' is available in the sandbox", name=name)
+        return leaf if fromlist else module
+    return sandbox_import
+
+
+def check_source(code, tree):
+    """Raise SyntaxError if code (parsed as tree) uses a blocked attribute or name"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr in BLOCKED_ATTRIBUTES:
+            blocked = node.attr
+        else:
+            blocked = next((name for name in _bound_names(node) if name in BLOCKED_NAMES), None)
+        if blocked is not None:
+            line = code.splitlines()[node.lineno - 1] if hasattr(node, 'lineno') else None
+            hint = f"; {BLOCKED_HINTS[blocked]}" if blocked in BLOCKED_HINTS else ''
+            raise SyntaxError(
+                f"'{blocked}' is not available in the sandbox{hint}",
+                (SOURCE_NAME, getattr(node, 'lineno', 1), getattr(node, 'col_offset', 0) + 1, line),
+            )
+
+
+def _bound_names(node):
+    """Identifiers a node reads or binds"""
+    if isinstance(node, ast.Name):
+        return (node.id,)
+    if isinstance(node, ast.arg):
+        return (node.arg,)
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return (node.name,)
+    if isinstance(node, ast.alias):
+        return (node.name, node.asname)
+    if isinstance(node, (ast.Global, ast.Nonlocal)):
+        return tuple(node.names)
+    if isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)):
+        return (node.name,)
+    return ()
+
+
+def guard_handlers(tree):
+    """Start every except and finally block, and every __exit__, with the deadline check
+
+    Without it `while True: try: ... except: pass` outlives its time
+    limit: the watchdog's exception only ever lands in the try body.
+    """
+    for node in list(ast.walk(tree)):
+        if isinstance(node, ast.ExceptHandler):
+            _prepend_check(node.body)
+        elif isinstance(node, (ast.Try, getattr(ast, 'TryStar', ast.Try))) and node.finalbody:
+            _prepend_check(node.finalbody)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in ('__exit__', '__aexit__'):
+            _prepend_check(node.body)
+    return tree
+
+
+def _prepend_check(body):
+    call = ast.Expr(ast.Call(ast.Name(DEADLINE_CHECK, ast.Load()), [], []))
+    body.insert(0, ast.copy_location(call, body[0]))
+    ast.fix_missing_locations(call)
+
+
+def make_globals(stdout, fs=None):
+    """Fresh sandbox namespace whose print writes to stdout and open() to fs"""
+    fs = fs if fs is not None else vfs.VirtualFS()
+    sandbox_builtins = dict(SAFE_BUILTINS)
+    sandbox_builtins['print'] = _make_print(stdout)
+    sandbox_builtins['open'] = fs.open
+    sandbox_builtins['__import__'] = _make_import(fs)
+    sandbox_builtins[DEADLINE_CHECK] = WATCHDOG.check
+    return {'__builtins__': sandbox_builtins, '__name__': '__main__'}
+
+
+def run_code(code, profile=False, time_limit=TIME_LIMIT_SECONDS, enforce='watchdog',
+             namespace=None, read_line=None, empty_output='Code executed successfully',
+             files=None, fs=None, cancel=None):
+    """Execute learner code and return a result dict
+
+    Keys: success, output, outcome ('success', 'truncated', 'exception',
+    'timeout' or 'cancelled'), usage (cpu_seconds, wall_seconds and
+    peak_memory_kb, which only worker processes fill in) and profile
+    when requested. enforce picks how the time
+    limit is applied: 'watchdog' or 'monitoring' (subinterpreters).
+
+    namespace, when given, is reused and keeps whatever the code defines
+    (REPL sessions). read_line enables input(); see _make_input.
+    empty_output is reported when a successful run printed nothing.
+
+    open() gets a fresh virtual filesystem seeded with files (name ->
+    text), dropped when the run ends; pass fs to keep one across runs.
+    cancel is a CancelToken that stops the run early (watchdog only).
+    """
+    cpu_start, wall_start = time.thread_time(), time.perf_counter()
+    stdout = OutputCapture()
+    profiler = Profiler() if profile else None
+    outcome = 'exception'
+    watch = WATCHDOG.watch(time_limit) if enforce == 'watchdog' else None
+    guard = MonitoringDeadline(time_limit) if enforce == 'monitoring' else None
+    run_globals = make_globals(stdout, fs if fs is not None else vfs.VirtualFS(files))
+    if read_line is not None:
+        run_globals['__builtins__']['input'] = _make_input(stdout, read_line, watch)
+    if namespace is not None:
+        namespace['__builtins__'] = run_globals['__builtins__']
+        namespace.setdefault('__name__', '__main__')
+        run_globals = namespace
+    if cancel is not None and watch is not None:
+        binding = cancel.bind(lambda: WATCHDOG.cancel(watch))
+    else:
+        binding = nullcontext()
+    try:
+        try:
+            with binding:
+                tree = ast.parse(code, SOURCE_NAME)
+                check_source(code, tree)
+                compiled = compile(guard_handlers(tree), SOURCE_NAME, 'exec')
+                if guard is not None:
+                    guard.instrument(compiled)
+                previous = sys.gettrace()
+                if profiler:
+                    sys.settrace(profiler.global_trace)
+                try:
+                    # One namespace, so top-level functions can call each other
+                    exec(compiled, run_globals)
+                finally:
+                    if profiler:
+                        sys.settrace(previous)
+        finally:
+            if watch is not None:
+                WATCHDOG.release(watch)
+            if guard is not None:
+                guard.cancel()
+        outcome = 'truncated' if stdout.truncated else 'success'
+        output = _with_notice(stdout, None) or empty_output
+    except ExecutionTimeout as e:
+        if watch is not None:
+            # The timeout may have cut the first release short
+            WATCHDOG.release(watch)
+        if isinstance(e, ExecutionCancelled):
+            outcome = 'cancelled'
+            output = _with_notice(stdout, f'Cancelled: {cancel.reason if cancel else "stopped early"}')
+        else:
+            outcome = 'timeout'
+            output = _with_notice(stdout, f'Error: Execution timed out after {time_limit:g} seconds')
+    except Exception:
+        output = traceback.format_exc()
+
+    result = {
+        'success': outcome in ('success', 'truncated'), 'output': output, 'outcome': outcome,
+        'usage': {
+            'cpu_seconds': round(time.thread_time() - cpu_start, 6),
+            'wall_seconds': round(time.perf_counter() - wall_start, 6),
+            'peak_memory_kb': None,
+        },
+    }
+    if profiler:
+        result['profile'] = profiler.report(code)
+    return result
+
+
+def _with_notice(stdout, message):
+    """Captured output followed by the truncation notice and/or message"""
+    text = stdout.getvalue()
+    notices = []
+    if stdout.truncated:
+        notices.append(f'... output truncated after {stdout.limit} characters')
+    if message:
+        notices.append(message)
+    if not notices:
+        return text
+    if text and not text.endswith('\n'):
+        text += '\n'
+    return text + '\n'.join(notices)
+
+
+def _reset_peak_memory():
+    """Restart this process's peak RSS counter; False where Linux's clear_refs is missing"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_memory_kb():
+    """Peak RSS since the last reset, in kB"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return None
+
+
+def serve(requests, replies, enforce='watchdog', memory=False):
+    """Worker loop: one JSON job per line in, one JSON result per line out
+
+    A job is {"code", "profile", "time_limit", "files"}; the reply is
+    run_code's result. Runs until requests reaches EOF. With memory, the
+    loop owns its process and reports each job's peak RSS.
+    """
+    preload_modules()
+    for line in requests:
+        try:
+            job = json.loads(line)
+        except ValueError:
+            continue
+        metered = memory and _reset_peak_memory()
+        result = run_code(
+            job.get('code', ''),
+            profile=bool(job.get('profile')),
+            time_limit=float(job.get('time_limit', TIME_LIMIT_SECONDS)),
+            enforce=enforce,
+            files=job.get('files'),
+        )
+        if metered:
+            result['usage']['peak_memory_kb'] = _peak_memory_kb()
+        replies.write(json.dumps(result) + '\n')
+        replies.flush()
+
+
+def serve_session(requests, replies):
+    """REPL session loop: cells run one after another in one namespace
+
+    In:  {"op": "run", "code", "time_limit"}, or {"op": "notebook", ...}
+         to re-run a whole program incrementally (see _run_notebook), and
+         while a cell waits on input(), {"op": "stdin", "data"} or
+         {"op": "eof"}.
+    Out: {"type": "input", "output"} when a cell calls input(), carrying
+         the output written since the last message, then one
+         {"type": "result", ...run_code result} per cell holding the rest.
+
+    Files written with open() last as long as the session.
+    """
+    preload_modules()
+    namespace = {}
+    cells = notebook.Notebook()
+    fs = vfs.VirtualFS()
+
+    def send(message):
+        replies.write(json.dumps(message) + '\n')
+        replies.flush()
+
+    for line in requests:
+        try:
+            job = json.loads(line)
+        except ValueError:
+            continue
+        if job.get('op') not in ('run', 'notebook'):
+            continue
+        shown = ''
+
+        def read_line(stdout):
+            nonlocal shown
+            text = stdout.getvalue()
+            send({'type': 'input', 'output': text[len(shown):]})
+            shown = text
+            for reply in requests:
+                try:
+                    message = json.loads(reply)
+                except ValueError:
+                    continue
+                if message.get('op') == 'stdin':
+                    return str(message.get('data', ''))
+                if message.get('op') == 'eof':
+                    return None
+            return None
+
+        time_limit = float(job.get('time_limit', TIME_LIMIT_SECONDS))
+        metered = _reset_peak_memory()
+        if job['op'] == 'notebook':
+            result = _run_notebook(cells, job.get('code', ''), time_limit, read_line, fs)
+        else:
+            result = run_code(
+                job.get('code', ''), time_limit=time_limit, namespace=namespace, read_line=read_line, fs=fs
+            )
+            if shown and result['output'].startswith(shown):
+                result['output'] = result['output'][len(shown):]
+        if metered:
+            result['usage']['peak_memory_kb'] = _peak_memory_kb()
+        send({'type': 'result', **result})
+
+
+def _run_notebook(cells, source, time_limit, read_line, fs):
+    """Run source as notebook cells, re-running only what changed
+
+    The output is the whole program's, cached cells included; "notebook"
+    lists each cell's first line, whether it ran and its outcome.
+    """
+    usage = {'cpu_seconds': 0.0, 'wall_seconds': 0.0, 'peak_memory_kb': None}
+
+    def run_cell(code, namespace, limit):
+        result = run_code(code, time_limit=limit, namespace=namespace, read_line=read_line, empty_output='', fs=fs)
+        usage['cpu_seconds'] += result['usage']['cpu_seconds']
+        usage['wall_seconds'] += result['usage']['wall_seconds']
+        return result
+
+    results = cells.run(source, run_cell, time_limit)
+    failed = next((r for r in results if r['ran'] and r['outcome'] not in ('success', 'truncated')), None)
+    if failed is not None:
+        outcome = failed['outcome']
+    elif any(r['outcome'] == 'truncated' for r in results):
+        outcome = 'truncated'
+    else:
+        outcome = 'success'
+    return {
+        'success': failed is None,
+        'output': ''.join(r['output'] for r in results) or 'Code executed successfully',
+        'outcome': outcome,
+        'notebook': [{'line': r['line'], 'ran': r['ran'], 'outcome': r['outcome']} for r in results],
+        'usage': usage,
+    }
+
+
+def worker_main():
+    """Process worker entry point (python sandbox.py --worker, or --session)
+
+    The real stdout fd is kept for the protocol and fd 1 is pointed at
+    stderr, so stray writes cannot corrupt a reply.
+    """
+    replies = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    os.dup2(2, 1)
+    if '--session' in sys.argv:
+        serve_session(sys.stdin, replies)
+    else:
+        serve(sys.stdin, replies, memory=True)
+
+
+if __name__ == '__main__' and ('--worker' in sys.argv or '--session' in sys.argv):
+    worker_main()
@@ -0,0 +1,212 @@
+"""
+Fair-Share Scheduler
+Decides which waiting execution gets the next free worker slot
+
+Runs come in three priority classes: interactive (lesson runs), playground
+and batch (instructor regrades and other bulk jobs). The highest class
+with work waiting goes first. Inside a class, users take turns by deficit
+round-robin over worker-seconds, so one learner's slow programs (or one
+instructor's 5,000-run regrade) cannot crowd out everyone else in that
+class.
+
+Two rules keep the classes from starving each other:
+- Aging: a class whose oldest waiter has waited AGING_SECONDS moves up a
+  level, up to interactive, where ties go to whoever has waited longest.
+- Batch share: batch runs never hold more than BATCH_SHARE of the slots,
+  so a regrade always leaves workers free for learners.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+
+PRIORITIES = ('interactive', 'playground', 'batch')
+# Worker-seconds a user is credited each time their turn comes round
+QUANTUM_SECONDS = 0.1
+AGING_SECONDS = float(os.environ.get('ACA_AGING_SECONDS', '5'))
+BATCH_SHARE = float(os.environ.get('ACA_BATCH_SHARE', '0.75'))
+# Assumed cost of a run before any have finished
+INITIAL_COST_SECONDS = 0.05
+
+WAIT_SECONDS = metrics.Histogram(
+    'aca_scheduler_wait_seconds', 'Time executions waited for a worker slot', labelnames=('priority',)
+)
+
+
+class Ticket:
+    """One run's place in the scheduler, from submission to release"""
+
+    __slots__ = ('user', 'priority', 'enqueued', 'started', 'cost', 'granted', 'event')
+
+    def __init__(self, user, priority):
+        self.user = user
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.cost = 0.0
+        self.granted = False
+        self.event = threading.Event()
+
+
+class _Flow:
+    __slots__ = ('queue', 'deficit', 'running')
+
+    def __init__(self):
+        self.queue = deque()
+        self.deficit = 0.0
+        self.running = 0   # granted tickets not yet released
+
+
+class _Class:
+    """One priority class: a round-robin ring of users with waiting or running runs"""
+
+    def __init__(self):
+        self.flows = OrderedDict()   # user -> _Flow, next turn first
+        self.running = 0
+        self.cost = INITIAL_COST_SECONDS   # moving average of run time
+
+    def waiting(self):
+        return any(flow.queue for flow in self.flows.values())
+
+    def oldest(self):
+        return min(flow.queue[0].enqueued for flow in self.flows.values() if flow.queue)
+
+    def pop(self):
+        """Next ticket by deficit round-robin; only call while waiting()"""
+        while True:
+            user, flow = next(iter(self.flows.items()))
+            if not flow.queue or flow.deficit <= 0:
+                # One quantum per turn, so debt from long runs is paid off
+                # over several rounds while other users go first
+                if flow.queue:
+                    flow.deficit += QUANTUM_SECONDS
+                self.flows.move_to_end(user)
+                continue
+            ticket = flow.queue.popleft()
+            ticket.cost = self.cost
+            flow.deficit -= ticket.cost
+            flow.running += 1
+            return ticket
+
+    def settle(self, ticket, elapsed):
+        """Replace the estimate charged at grant with the time actually used"""
+        flow = self.flows[ticket.user]
+        flow.running -= 1
+        flow.deficit += ticket.cost - elapsed
+        self.discard_idle(ticket.user)
+
+    def discard_idle(self, user):
+        """Drop a user with nothing queued or running (classic DRR: no credit or debt kept)"""
+        flow = self.flows.get(user)
+        if flow is not None and not flow.queue and not flow.running:
+            del self.flows[user]
+
+
+class FairScheduler:
+    """Admits at most `slots` runs at once, in fair-share order"""
+
+    def __init__(self, slots, aging_seconds=AGING_SECONDS, batch_share=BATCH_SHARE):
+        self.slots = slots
+        self.aging_seconds = aging_seconds
+        self.batch_share = batch_share
+        self._lock = threading.Lock()
+        self._classes = {name: _Class() for name in PRIORITIES}
+        self._running = 0
+
+    def acquire(self, user, priority='playground', cancel=None):
+        """Wait for a slot; returns a Ticket for release(), or None if cancelled first"""
+        if priority not in self._classes:
+            raise ValueError(f"Unknown priority class: {priority}")
+        ticket = Ticket(user, priority)
+        with self._lock:
+            flows = self._classes[priority].flows
+            flow = flows.get(user)
+            if flow is None:
+                flow = flows[user] = _Flow()
+            flow.queue.append(ticket)
+            self._dispatch()
+        if not ticket.granted:
+            if cancel is not None:
+                with cancel.bind(ticket.event.set):
+                    ticket.event.wait()
+            else:
+                ticket.event.wait()
+        with self._lock:
+            if not ticket.granted:
+                self._withdraw(ticket)
+                return None
+        WAIT_SECONDS.observe(ticket.started - ticket.enqueued, priority)
+        return ticket
+
+    def release(self, ticket):
+        """Give the slot back and charge the user for the time it was held"""
+        elapsed = time.monotonic() - ticket.started
+        with self._lock:
+            cls = self._classes[ticket.priority]
+            cls.running -= 1
+            self._running -= 1
+            cls.cost += (elapsed - cls.cost) * 0.2
+            cls.settle(ticket, elapsed)
+            self._dispatch()
+
+    def resize(self, slots):
+        with self._lock:
+            self.slots = slots
+            self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'running': cls.running,
+                    'queued': sum(len(flow.queue) for flow in cls.flows.values()),
+                    'users': sum(1 for flow in cls.flows.values() if flow.queue),
+                }
+                for name, cls in self._classes.items()
+            }
+
+    def batch_limit(self):
+        return max(1, int(self.slots * self.batch_share))
+
+    def _dispatch(self):
+        while self._running < self.slots:
+            cls = self._pick()
+            if cls is None:
+                return
+            ticket = cls.pop()
+            cls.running += 1
+            self._running += 1
+            ticket.started = time.monotonic()
+            ticket.granted = True
+            ticket.event.set()
+
+    def _pick(self):
+        """The class to serve next, after aging, or None"""
+        now = time.monotonic()
+        best, best_key = None, None
+        for rank, name in enumerate(PRIORITIES):
+            cls = self._classes[name]
+            if not cls.waiting():
+                continue
+            if name == 'batch' and cls.running >= self.batch_limit():
+                continue
+            oldest = cls.oldest()
+            level = max(0, rank - int((now - oldest) / self.aging_seconds))
+            key = (level, oldest)
+            if best_key is None or key < best_key:
+                best, best_key = cls, key
+        return best
+
+    def _withdraw(self, ticket):
+        cls = self._classes[ticket.priority]
+        flow = cls.flows.get(ticket.user)
+        if flow is None:
+            return
+        try:
+            flow.queue.remove(ticket)
+        except ValueError:
+            return
+        cls.discard_idle(ticket.user)
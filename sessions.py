@@ -0,0 +1,188 @@
+"""
+REPL Sessions
+Live per-learner interpreters behind the playground's session mode
+
+Each session is a `python sandbox.py --session` child process whose
+namespace survives between cells, so running a cell only costs that
+cell's code. When a cell calls input(), the prompt goes out over the
+learner's WebSocket and the reply is fed back in as stdin.
+
+Sessions idle for ACA_SESSION_IDLE_SECONDS (default 600) are reaped, and
+at most ACA_MAX_SESSIONS (default 32) are open per server process.
+"""
+
+import atexit
+import os
+import threading
+import time
+
+import executor
+import metrics
+import sandbox
+
+MAX_SESSIONS = int(os.environ.get('ACA_MAX_SESSIONS', '32'))
+IDLE_SECONDS = float(os.environ.get('ACA_SESSION_IDLE_SECONDS', '600'))
+# How long a cell may wait for the learner to answer input()
+INPUT_TIMEOUT_SECONDS = 300
+
+
+class SessionLimitReached(Exception):
+    """Every session slot on this server is taken"""
+
+
+class SessionClosed(Exception):
+    """The session was reaped or closed; open a new one from the manager"""
+
+
+class ReplSession:
+    """One learner's interpreter; the worker starts on the first cell"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+        self.cells = 0
+        self.closed = False
+        self._worker = None
+
+    def run(self, code, ask_input, time_limit=sandbox.TIME_LIMIT_SECONDS, op='run'):
+        """Run one cell and return its result message
+
+        ask_input(output) is called when the cell waits on input(), with
+        the output written so far; it returns the reply line, or None to
+        signal end of input. op='notebook' runs code as a whole program
+        split into cells, re-running only what changed since last time.
+        Raises SessionClosed once the session has been reaped or closed.
+        """
+        with self.lock:
+            if self.closed:
+                raise SessionClosed()
+            self.last_active = time.monotonic()
+            try:
+                if self._worker is None:
+                    self._worker = executor.ProcessWorker('--session')
+                    if self.closed:
+                        raise SessionClosed()
+                self._worker.send({'op': op, 'code': code, 'time_limit': time_limit})
+                while True:
+                    message = self._worker.receive(timeout=time_limit + executor.HARD_TIMEOUT_GRACE)
+                    if message.get('type') != 'input':
+                        break
+                    reply = ask_input(message.get('output', ''))
+                    if reply is None:
+                        self._worker.send({'op': 'eof'})
+                    else:
+                        self._worker.send({'op': 'stdin', 'data': reply})
+                self.cells += 1
+            except executor.WorkerLost:
+                self._worker = None
+                self.cells = 0
+                message = {
+                    'type': 'result',
+                    'success': False,
+                    'output': f'Error: Execution timed out after {time_limit:g} seconds\n'
+                              'The session was restarted, so earlier variables are gone.',
+                    'outcome': 'timeout',
+                    'usage': {'cpu_seconds': time_limit, 'wall_seconds': time_limit, 'peak_memory_kb': None},
+                }
+            except BaseException:
+                # Left mid-cell; the worker's state is unknown
+                self._discard()
+                raise
+            finally:
+                self.last_active = time.monotonic()
+            return message
+
+    def reset(self):
+        """Forget every name defined so far"""
+        with self.lock:
+            self._discard()
+
+    def close(self):
+        self.closed = True
+        self._discard()
+
+    def _discard(self):
+        if self._worker is not None:
+            self._worker.close()
+            self._worker = None
+        self.cells = 0
+
+
+class SessionManager:
+    """Open sessions by learner, with a cap and a background idle reaper"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_seconds=IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def open(self, key):
+        """The learner's live session, created if needed
+
+        Raises SessionLimitReached when the server is full even after
+        reaping idle sessions.
+        """
+        with self._lock:
+            repl = self._sessions.get(key)
+            if repl is not None:
+                repl.last_active = time.monotonic()
+                return repl
+        if len(self._sessions) >= self.max_sessions:
+            self.reap_idle()
+        with self._lock:
+            repl = self._sessions.get(key)
+            if repl is None:
+                if len(self._sessions) >= self.max_sessions:
+                    raise SessionLimitReached()
+                repl = self._sessions[key] = ReplSession()
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_forever, name='repl-reaper', daemon=True)
+                self._reaper.start()
+            return repl
+
+    def close(self, key):
+        with self._lock:
+            repl = self._sessions.pop(key, None)
+        if repl is not None:
+            repl.close()
+
+    def reap_idle(self):
+        """Close sessions idle past idle_seconds; returns how many"""
+        cutoff = time.monotonic() - self.idle_seconds
+        reaped = []
+        with self._lock:
+            for key, repl in list(self._sessions.items()):
+                # A session in the middle of a cell is never idle
+                if repl.last_active < cutoff and repl.lock.acquire(blocking=False):
+                    try:
+                        del self._sessions[key]
+                        repl.closed = True
+                        reaped.append(repl)
+                    finally:
+                        repl.lock.release()
+        for repl in reaped:
+            repl.close()
+        return len(reaped)
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(max(1.0, min(self.idle_seconds / 2, 60.0)))
+            self.reap_idle()
+
+    def count(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def shutdown(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for repl in sessions:
+            repl.close()
+
+
+SESSIONS = SessionManager()
+atexit.register(SESSIONS.shutdown)
+
+metrics.Gauge('aca_repl_sessions', 'Open REPL sessions', SESSIONS.count)
@@ -49,8 +49,9 @@ async function runCode(topicIndex) {
     outputElement.textContent = 'Running code...';
     outputElement.classList.remove('error');
 
-    // Execute code
-    const result = await executeCode(code);
+    // Execute code; re-running this topic supersedes the previous run
+    const result = await executeCode(code, { runToken: `topic-${topicIndex}` });
+    if (result.cancelled) return;
 
     // Display result
     formatOutput(outputElement, result);
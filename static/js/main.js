@@ -38,8 +38,23 @@ function initializeCodeEditors() {
     });
 }
 
+// Fetches in flight by run token (one per editor)
+const activeRuns = new Map();
+
 // Utility function to execute code
-async function executeCode(code) {
+// options are merged into the request body, e.g. { profile: true }.
+// options.runToken names the editor: a new run with the same token aborts
+// the previous request (the server cancels it too) and that call resolves
+// with { cancelled: true }.
+async function executeCode(code, options = {}) {
+    const { runToken, ...extra } = options;
+    let controller = null;
+    if (runToken) {
+        activeRuns.get(runToken)?.abort();
+        controller = new AbortController();
+        activeRuns.set(runToken, controller);
+        extra.run_token = runToken;
+    }
     try {
         const csrfToken = document.querySelector('meta[name="csrf-token"]')?.getAttribute('content');
         const headers = {
@@ -53,16 +68,24 @@ async function executeCode(code) {
         const response = await fetch('/execute', {
             method: 'POST',
             headers: headers,
-            body: JSON.stringify({ code: code })
+            body: JSON.stringify({ code: code, ...extra }),
+            signal: controller?.signal
         });
 
         const result = await response.json();
         return result;
     } catch (error) {
+        if (error.name === 'AbortError') {
+            return { success: false, cancelled: true, output: 'Cancelled: superseded by a newer run' };
+        }
         return {
             success: false,
             output: `Error: ${error.message}`
         };
+    } finally {
+        if (runToken && activeRuns.get(runToken) === controller) {
+            activeRuns.delete(runToken);
+        }
     }
 }
 
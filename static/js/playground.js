@@ -33,14 +33,20 @@ async function runPlaygroundCode() {
     
     if (!playgroundEditor) return;
 
+    if (runMode !== 'fresh') {
+        runSessionCell();
+        return;
+    }
+
     const code = playgroundEditor.getValue();
 
     // Show loading state
     outputElement.textContent = 'Running code...';
     outputElement.classList.remove('error');
 
-    // Execute code
-    const result = await executeCode(code);
+    // Execute code; a newer run from this editor supersedes this one
+    const result = await executeCode(code, { runToken: 'playground' });
+    if (result.cancelled) return;
 
     // Display result
     formatOutput(outputElement, result);
@@ -61,3 +67,227 @@ function clearOutput() {
         outputElement.classList.remove('error');
     }
 }
+
+// Run code with profiling and show the timing breakdown
+async function profilePlaygroundCode() {
+    const outputElement = document.getElementById('playground-output');
+
+    if (!playgroundEditor) return;
+
+    const code = playgroundEditor.getValue();
+
+    outputElement.textContent = 'Profiling code...';
+    outputElement.classList.remove('error');
+
+    const result = await executeCode(code, { profile: true, runToken: 'playground' });
+    if (result.cancelled) return;
+
+    formatOutput(outputElement, result);
+    if (result.profile) {
+        renderProfile(result.profile);
+    }
+}
+
+// Fold "a;b;c" stacks into a tree of { name, ms, children }
+function buildFlameTree(flame) {
+    const root = { name: 'all', ms: 0, children: new Map() };
+    flame.forEach(entry => {
+        let node = root;
+        root.ms += entry.self_ms;
+        entry.stack.forEach(name => {
+            if (!node.children.has(name)) {
+                node.children.set(name, { name: name, ms: 0, children: new Map() });
+            }
+            node = node.children.get(name);
+            node.ms += entry.self_ms;
+        });
+    });
+    return root;
+}
+
+// One flame row per call depth; block width is the share of total time
+function renderFlameNode(node, totalMs) {
+    const block = document.createElement('div');
+    block.className = 'flame-node';
+    block.style.width = `${totalMs ? (node.ms / totalMs) * 100 : 0}%`;
+
+    const label = document.createElement('div');
+    label.className = 'flame-label';
+    label.textContent = `${node.name} (${node.ms.toFixed(2)} ms)`;
+    label.title = label.textContent;
+    block.appendChild(label);
+
+    if (node.children.size) {
+        const row = document.createElement('div');
+        row.className = 'flame-children';
+        [...node.children.values()]
+            .sort((a, b) => b.ms - a.ms)
+            .forEach(child => row.appendChild(renderFlameNode(child, node.ms)));
+        block.appendChild(row);
+    }
+    return block;
+}
+
+function fillTable(table, headers, rows) {
+    table.innerHTML = '';
+    const head = table.insertRow();
+    headers.forEach(text => {
+        const th = document.createElement('th');
+        th.textContent = text;
+        head.appendChild(th);
+    });
+    rows.forEach(values => {
+        const tr = table.insertRow();
+        values.forEach(value => {
+            tr.insertCell().textContent = value;
+        });
+    });
+}
+
+// Render the profile payload returned by /execute
+function renderProfile(profile) {
+    document.getElementById('playground-profile').hidden = false;
+    document.getElementById('profile-total').textContent = `${profile.total_ms.toFixed(2)} ms total`;
+
+    const flameElement = document.getElementById('profile-flame');
+    flameElement.innerHTML = '';
+    const tree = buildFlameTree(profile.flame);
+    flameElement.appendChild(renderFlameNode(tree, tree.ms));
+
+    const lines = [...profile.lines].sort((a, b) => b.time_ms - a.time_ms);
+    fillTable(
+        document.getElementById('profile-lines'),
+        ['Line', 'Hits', 'Time (ms)', 'Code'],
+        lines.map(l => [l.line, l.hits, l.time_ms.toFixed(3), l.source])
+    );
+    fillTable(
+        document.getElementById('profile-functions'),
+        ['Function', 'Calls', 'Total (ms)', 'Self (ms)'],
+        profile.functions.map(f => [`${f.name} (line ${f.line})`, f.calls, f.total_ms.toFixed(3), f.self_ms.toFixed(3)])
+    );
+}
+
+// Session and notebook modes run code in a live interpreter that keeps
+// variables between runs, over a WebSocket. Notebook mode sends the whole
+// program and the server re-runs only the cells an edit affects.
+let runMode = 'fresh';
+let sessionSocket = null;
+let sessionReady = null;
+let pendingCell = null;
+
+function setRunMode(mode) {
+    runMode = mode;
+    const status = document.getElementById('session-status');
+    const resetButton = document.getElementById('session-reset');
+    resetButton.hidden = mode === 'fresh';
+    if (mode === 'fresh') {
+        status.textContent = '';
+        if (sessionSocket) {
+            sessionSocket.close();
+        }
+    } else if (!sessionSocket) {
+        status.textContent = 'Connecting...';
+        connectSession();
+    }
+}
+
+function connectSession() {
+    const scheme = location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const socket = new WebSocket(`${scheme}//${location.host}/ws/session`);
+    sessionSocket = socket;
+    sessionReady = new Promise((resolve) => {
+        socket.addEventListener('message', function(event) {
+            handleSessionMessage(JSON.parse(event.data), resolve);
+        });
+    });
+    socket.addEventListener('close', function() {
+        if (sessionSocket !== socket) return;
+        sessionSocket = null;
+        if (pendingCell) {
+            pendingCell({ success: false, output: 'Error: Session connection closed' });
+            pendingCell = null;
+        }
+        if (runMode !== 'fresh') {
+            document.getElementById('session-status').textContent = 'Disconnected';
+        }
+    });
+}
+
+function handleSessionMessage(message, onReady) {
+    const status = document.getElementById('session-status');
+    const outputElement = document.getElementById('playground-output');
+    if (message.type === 'ready') {
+        status.textContent = `Session: ${message.cells} cells run`;
+        onReady();
+    } else if (message.type === 'input') {
+        // The cell is waiting on input(); the last output line is its prompt
+        outputElement.textContent += message.output;
+        const lines = message.output.split('\n');
+        const answer = window.prompt(lines[lines.length - 1] || 'Input:');
+        if (answer === null) {
+            sessionSocket.send(JSON.stringify({ type: 'eof' }));
+        } else {
+            outputElement.textContent += answer + '\n';
+            sessionSocket.send(JSON.stringify({ type: 'stdin', data: answer }));
+        }
+    } else if (message.type === 'result') {
+        if (message.notebook) {
+            const reran = message.notebook.filter(cell => cell.ran).length;
+            status.textContent = `Notebook: re-ran ${reran} of ${message.notebook.length} cells`;
+        } else if (message.cells !== undefined) {
+            status.textContent = `Session: ${message.cells} cells run`;
+        }
+        if (pendingCell) {
+            pendingCell(message);
+            pendingCell = null;
+        }
+    } else if (message.type === 'error') {
+        status.textContent = message.output;
+        onReady();
+    }
+}
+
+// Session mode runs the selection, or the whole editor, as the next cell;
+// notebook mode always sends the whole editor
+async function runSessionCell() {
+    const outputElement = document.getElementById('playground-output');
+    const notebook = runMode === 'notebook';
+    const code = notebook ? playgroundEditor.getValue() : (playgroundEditor.getSelection() || playgroundEditor.getValue());
+
+    if (!sessionSocket) {
+        connectSession();
+    }
+    await sessionReady;
+    if (!sessionSocket || sessionSocket.readyState !== WebSocket.OPEN || pendingCell) return;
+
+    if (notebook || outputElement.textContent === 'Output will appear here...') {
+        outputElement.textContent = '';
+    }
+    outputElement.classList.remove('error');
+    if (!notebook) {
+        outputElement.textContent += `>>> cell\n`;
+    }
+
+    const result = await new Promise((resolve) => {
+        pendingCell = resolve;
+        sessionSocket.send(JSON.stringify({ type: notebook ? 'notebook' : 'run', code: code }));
+    });
+
+    if (notebook) {
+        // The output covers the whole program, cached cells included
+        formatOutput(outputElement, result);
+        return;
+    }
+    outputElement.textContent += (result.output || '') + '\n';
+    if (!result.success) {
+        outputElement.classList.add('error');
+    }
+    outputElement.scrollTop = outputElement.scrollHeight;
+}
+
+function resetSession() {
+    if (sessionSocket && sessionSocket.readyState === WebSocket.OPEN) {
+        sessionSocket.send(JSON.stringify({ type: 'reset' }));
+        clearOutput();
+    }
+}
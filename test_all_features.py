@@ -10,6 +10,17 @@ import json
 def test_app():
     """Test all application features"""
     client = app.test_client()
+    # Lessons get marked complete and executions record usage: work on copies
+    import os
+    import shutil
+    import tempfile
+    import progress
+    import usage
+    scratch = tempfile.mkdtemp()
+    if os.path.exists(progress.PROGRESS_FILE):
+        shutil.copy(progress.PROGRESS_FILE, scratch)
+    progress.PROGRESS_FILE = os.path.join(scratch, 'progress_data.json')
+    usage.LEDGER = usage.UsageLedger(path=os.path.join(scratch, 'usage_data.json'))
     
     print("=" * 60)
     print("PYLEARN PLATFORM - COMPREHENSIVE FEATURE TEST")
@@ -55,6 +66,350 @@ def test_app():
         print(f"  ✓ Success: {data.get('success')}")
         print(f"  ✓ Output: {data.get('output')[:50]}...")
     
+    # Test 4b: Profiling and time limits
+    print("\n[TEST 4b] Profiled Execution")
+    r = client.post('/execute', json={'code': 'def f(n):\n    return n * 2\nprint(f(21))', 'profile': True})
+    data = r.get_json()
+    assert data['success'] and data['output'].strip() == '42'
+    assert any(fn['name'] == 'f' and fn['calls'] == 1 for fn in data['profile']['functions'])
+    print(f"  ✓ Profile returned: {len(data['profile']['lines'])} lines, {data['profile']['total_ms']} ms")
+    import sandbox
+    result = sandbox.run_code('while True:\n    pass', time_limit=0.2)
+    assert result['outcome'] == 'timeout' and not result['success']
+    # A bare except around the loop cannot swallow the timeout
+    swallowing = 'while True:\n    try:\n        while True:\n            pass\n    except:\n        pass'
+    assert sandbox.run_code(swallowing, time_limit=0.5)['outcome'] == 'timeout'
+    spinning = 'def spin():\n    while True:\n        pass\nwhile True:\n    try:\n        spin()\n    except:\n        pass'
+    assert sandbox.run_code(spinning, time_limit=0.5)['outcome'] == 'timeout'
+    assert client.post('/execute', json={'code': 'print(1)'}).get_json()['output'] == '1\n'
+    print("  ✓ Runaway loop stopped at the time limit")
+    
+    # Test 4c: Concurrent runs keep their own output
+    print("\n[TEST 4c] Concurrent Execution Isolation")
+    from concurrent.futures import ThreadPoolExecutor
+    def run_numbered(i):
+        code = f"for k in range(300):\n    print('run{i}', k)"
+        return i, app.test_client().post('/execute', json={'code': code}).get_json()['output']
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for i, output in pool.map(run_numbered, range(8)):
+            lines = output.splitlines()
+            assert len(lines) == 300 and all(line.startswith(f'run{i} ') for line in lines)
+    print("  ✓ 8 simultaneous runs captured without interleaving")
+    
+    # Test 4d: Process execution backend
+    print("\n[TEST 4d] Process Execution Backend")
+    import executor
+    backend = executor.make_backend('process', 1)
+    try:
+        assert backend.run("print('from a worker')")['output'] == 'from a worker\n'
+        assert backend.run('while True:\n    pass', time_limit=0.2)['outcome'] == 'timeout'
+        assert backend.run('print(sum([1, 2]))')['output'] == '3\n'
+    finally:
+        backend.shutdown()
+    if executor._interpreters_module() is None:
+        import warnings
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            backend = executor.make_backend('subinterpreter', 1)
+        backend.shutdown()
+        assert backend.name == 'process' and caught[0].category is RuntimeWarning
+    print("  ✓ Worker runs code, enforces the limit and stays usable")
+
+    print("\n[TEST 4e] REPL Sessions")
+    import sessions
+    manager = sessions.SessionManager(max_sessions=1, idle_seconds=60)
+    try:
+        repl = manager.open('learner-a')
+        assert repl.run('total = 40', None)['success']
+        assert repl.run('total += 2\nprint(total)', None)['output'] == '42\n'
+        asked = []
+        reply = repl.run('name = input("Name? ")\nprint("Hi", name)', lambda output: asked.append(output) or 'Ada')
+        assert asked == ['Name? '] and reply['output'] == 'Hi Ada\n'
+        assert manager.open('learner-a') is repl
+        try:
+            manager.open('learner-b')
+            assert False, 'session cap not enforced'
+        except sessions.SessionLimitReached:
+            pass
+        repl.last_active -= 120
+        assert manager.reap_idle() == 1 and manager.count() == 0
+        # A reaped session refuses cells instead of starting an untracked worker
+        try:
+            repl.run('print(1)', None)
+            assert False, 'reaped session ran a cell'
+        except sessions.SessionClosed:
+            pass
+        assert repl._worker is None
+        other = manager.open('learner-b')
+        assert other.run('print(2)', None)['output'] == '2\n'
+    finally:
+        manager.shutdown()
+    assert other._worker is None and other.closed
+    print("  ✓ Cells share a namespace, input() is answered and idle sessions are reaped")
+
+    print("\n[TEST 4f] Notebook Cells")
+    import notebook
+    ran = []
+    def run_cell(code, namespace, time_limit):
+        ran.append(code.strip())
+        return sandbox.run_code(code, namespace=namespace, time_limit=time_limit, empty_output='')
+    lab = '''class TaskManager:
+    def __init__(self):
+        self.tasks = []
+    def add(self, task):
+        self.tasks.append(task)
+
+manager = TaskManager()
+manager.add("write tests")
+rate = 2
+print(len(manager.tasks))
+print(rate * 10)
+'''
+    book = notebook.Notebook()
+    outputs = lambda results: ''.join(r['output'] for r in results)
+    assert outputs(book.run(lab, run_cell, 5)) == '1\n20\n' and len(ran) == 6
+    ran.clear()
+    assert outputs(book.run(lab.replace('rate = 2', 'rate = 3'), run_cell, 5)) == '1\n30\n'
+    assert ran == ['rate = 3', 'print(rate * 10)'], ran
+    ran.clear()
+    assert outputs(book.run(lab.replace('write tests', 'ship it'), run_cell, 5)) == '1\n20\n'
+    assert ran == ['manager.add("ship it")', 'rate = 2', 'print(len(manager.tasks))', 'print(rate * 10)'], ran
+    assert book.namespace['manager'].tasks == ['ship it']
+    # Calling a function that mutates or rebinds a global changes that global
+    effects = '''items = []
+count = 0
+def add(x):
+    items.append(x)
+def bump(n):
+    global count
+    count = n
+add(3)
+bump(5)
+print(items, count)
+'''
+    book = notebook.Notebook()
+    assert outputs(book.run(effects, run_cell, 5)) == '[3] 5\n'
+    assert outputs(book.run(effects.replace('add(3)', 'add(4)'), run_cell, 5)) == '[4] 5\n'
+    assert outputs(book.run(effects.replace('add(3)', 'add(4)').replace('bump(5)', 'bump(7)'), run_cell, 5)) == '[4] 7\n'
+    # Names no earlier cell defines are gone, as in a fresh run
+    for before, after in (('x = 1\nprint(x)\n', 'y = 1\nprint(x)\n'), ("print('start')\nx = 5\n", 'print(x)\nx = 5\n')):
+        book = notebook.Notebook()
+        book.run(before, run_cell, 5)
+        assert 'NameError' in outputs(book.run(after, run_cell, 5)), after
+    print("  ✓ Only edited cells and their dependents re-run")
+
+    print("\n[TEST 4g] Virtual Filesystem")
+    import vfs
+    lesson = next(l for l in LEARNING_PATHS['advanced']['lessons'] if l['id'] == 'file_handling')
+    response = client.post('/execute', json={'code': lesson['code'], 'path_id': 'advanced', 'lesson_id': 'file_handling'})
+    data = json.loads(response.data)
+    assert data['success'] and 'Line: This is line 3' in data['output'] and 'Files keep data' in data['output']
+    data = json.loads(client.post('/execute', json={'code': 'open("example.txt")'}).data)
+    assert not data['success'] and 'FileNotFoundError' in data['output']
+    fs = vfs.VirtualFS(max_bytes=10)
+    try:
+        with fs.open('big.txt', 'w') as f:
+            f.write('x' * 11)
+        assert False, 'quota not enforced'
+    except OSError:
+        pass
+    assert fs.open('../../etc/passwd', 'w').name == 'etc/passwd'
+    # Unflushed buffers count against the quota, and open handles are capped
+    fs = vfs.VirtualFS(max_bytes=1000, max_open=4)
+    first, second = fs.open('a.bin', 'wb'), fs.open('b.bin', 'wb')
+    first.write(b'x' * 900)
+    try:
+        second.write(b'x' * 900)
+        assert False, 'buffered bytes not counted'
+    except OSError:
+        pass
+    handles = [fs.open('a.bin') for _ in range(2)]
+    try:
+        fs.open('a.bin')
+        assert False, 'open handles not capped'
+    except OSError:
+        pass
+    first.close()
+    fs.open('a.bin').close()
+    print("  ✓ Lesson files work in memory, runs are isolated and quotas hold")
+
+    print("\n[TEST 4h] Module Allowlist")
+    code = (
+        'import math, json\nfrom collections import Counter\nimport os\n'
+        'with open("a.txt", "w") as f:\n    f.write("x")\n'
+        'print(math.sqrt(16), json.dumps([1]), Counter("aab")["a"], os.path.exists("a.txt"), os.listdir())'
+    )
+    assert sandbox.run_code(code)['output'] == "4.0 [1] 2 True ['a.txt']\n"
+    for blocked in ('import sys', 'import subprocess'):
+        assert 'ModuleNotFoundError' in sandbox.run_code(blocked)['output']
+    assert sandbox.preload_modules() is sandbox.preload_modules()
+    # No way back to the real modules behind the copies, or to the builtins
+    for escape in (
+        'import json\njson.loads.__globals__["codecs"].open("/etc/hostname").read()',
+        'len.__self__.open("/etc/hostname")',
+        '().__class__.__mro__[-1].__subclasses__()',
+        'import operator\nimport json\noperator.attrgetter("__globals__")(json.loads)',
+        'from string import Formatter',
+        'print("{0.__globals__[os].environ}".format(print))',
+        'print("{0.__globals__[sys].modules[app].app.config[SECRET_KEY]}".format_map([print]))',
+    ):
+        assert not sandbox.run_code(escape)['success'], escape
+    # Each run imports its own module objects: no tampering with other runs
+    tamper = 'import math, json\nmath.sqrt = lambda x: "pwned"\njson.dumps = lambda *a, **k: "tampered"'
+    assert client.post('/execute', json={'code': tamper}).get_json()['success']
+    r = client.post('/execute', json={'code': 'import math, json\nprint(math.sqrt(16), json.dumps([1]))'})
+    assert r.get_json()['output'] == '4.0 [1]\n'
+    print("  ✓ Allowlisted modules import, os is virtual and others are refused")
+
+    print("\n[TEST 4i] Single-Flight Coalescing")
+    import threading
+    import time
+    flights = executor.SingleFlight()
+    release = threading.Event()
+    runs = []
+    def slow_run(cancel):
+        runs.append(1)
+        release.wait(5)
+        return {'output': 'shared'}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flights.do, 'same-source', slow_run) for _ in range(8)]
+        while not runs:
+            time.sleep(0.01)
+        time.sleep(0.1)  # let the other callers attach
+        release.set()
+        results = [f.result() for f in futures]
+    assert len(runs) == 1 and all(r[0] == {'output': 'shared'} for r in results)
+    assert sum(shared for _, shared in results) == 7
+    assert executor.is_deterministic('print(sum(range(10)))')
+    assert not executor.is_deterministic('import random\nprint(random.random())')
+    print("  ✓ Identical concurrent runs share one execution; random code is not coalesced")
+
+    print("\n[TEST 4j] Cancellation")
+    token = sandbox.CancelToken()
+    threading.Timer(0.2, token.cancel, args=('client disconnected',)).start()
+    start = time.monotonic()
+    result = sandbox.run_code('print("started")\nwhile True:\n    pass', time_limit=5, cancel=token)
+    assert time.monotonic() - start < 2
+    assert result['outcome'] == 'cancelled'
+    assert result['output'] == 'started\nCancelled: client disconnected'
+    runs = executor.RunRegistry()
+    first, second = sandbox.CancelToken(), sandbox.CancelToken()
+    with runs.supersede(('learner', 'playground'), first):
+        with runs.supersede(('learner', 'playground'), second):
+            assert first.cancelled and first.reason == 'superseded by a newer run'
+            assert not second.cancelled
+    done = sandbox.CancelToken()
+    done.cancel()
+    assert executor.run('print(1)', cancel=done)['outcome'] == 'cancelled'
+    # A bare except cannot swallow the cancellation either
+    token = sandbox.CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    swallowing = 'while True:\n    try:\n        while True:\n            pass\n    except:\n        pass'
+    assert sandbox.run_code(swallowing, time_limit=5, cancel=token)['outcome'] == 'cancelled'
+    # Disconnect checks work past fd 1024, where select() gives up
+    import socket
+    local, peer = socket.socketpair()
+    try:
+        local = socket.socket(fileno=os.dup2(local.fileno(), 1500))
+    except OSError:
+        pass   # open-file limit below 1500: check the low fd
+    assert not executor._peer_closed(local)
+    peer.close()
+    assert executor._peer_closed(local)
+    local.close()
+    print("  ✓ Cancelled runs stop early; a newer run supersedes the older one")
+
+    print("\n[TEST 4k] Fair-Share Scheduler")
+    import scheduler
+    order = []
+    def submit(fair, user, priority):
+        ticket = fair.acquire(user, priority)
+        order.append((user, priority))
+        time.sleep(0.04)  # runs cost worker time, which is what users take turns on
+        fair.release(ticket)
+    fair = scheduler.FairScheduler(slots=1, aging_seconds=60)
+    holder = fair.acquire('someone', 'playground')
+    waiting = [threading.Thread(target=submit, args=(fair, 'instructor', 'batch')) for _ in range(5)]
+    waiting += [threading.Thread(target=submit, args=(fair, 'grader-2', 'batch')),
+                threading.Thread(target=submit, args=(fair, 'learner', 'interactive'))]
+    for thread in waiting:
+        thread.start()
+        time.sleep(0.02)
+    assert fair.stats()['batch'] == {'running': 0, 'queued': 6, 'users': 2}
+    fair.release(holder)
+    for thread in waiting:
+        thread.join(5)
+    assert order[0] == ('learner', 'interactive')
+    # The second grader is not stuck behind the whole of the first one's backlog
+    assert order.index(('grader-2', 'batch')) < 5
+    # Worker-seconds even out however long each user's runs are
+    ring = scheduler._Class()
+    for user in ('slow', 'quick'):
+        ring.flows[user] = scheduler._Flow()
+        ring.flows[user].queue.extend(scheduler.Ticket(user, 'batch') for _ in range(2000))
+    held = {'slow': 0.0, 'quick': 0.0}
+    for _ in range(1000):
+        ticket = ring.pop()
+        elapsed = 0.2 if ticket.user == 'slow' else 0.01
+        held[ticket.user] += elapsed
+        ring.settle(ticket, elapsed)
+    assert 0.8 < held['slow'] / held['quick'] < 1.25
+    order.clear()
+    fair = scheduler.FairScheduler(slots=1, aging_seconds=0.05)
+    holder = fair.acquire('someone', 'playground')
+    old = threading.Thread(target=submit, args=(fair, 'instructor', 'batch'))
+    old.start()
+    time.sleep(0.2)
+    new = threading.Thread(target=submit, args=(fair, 'learner', 'interactive'))
+    new.start()
+    time.sleep(0.02)
+    fair.release(holder)
+    old.join(5), new.join(5)
+    assert order[0] == ('instructor', 'batch')
+    token = sandbox.CancelToken()
+    holder = fair.acquire('someone', 'playground')
+    threading.Timer(0.1, token.cancel).start()
+    assert fair.acquire('learner', 'interactive', token) is None
+    assert fair.stats()['interactive']['queued'] == 0
+    fair.release(holder)
+    print("  ✓ Lesson runs go first, users take turns, and long waits age upward")
+
+    print("\n[TEST 4l] Usage Accounting and Quotas")
+    measured = sandbox.run_code('total = 0\nfor i in range(100000):\n    total += i')['usage']
+    assert measured['cpu_seconds'] > 0 and measured['wall_seconds'] > 0
+    backend = executor.make_backend('process', 1)
+    try:
+        peak = backend.run('data = [0] * 5_000_000')['usage']['peak_memory_kb']
+        assert peak is None or peak > 5_000_000 * 8 // 1024
+    finally:
+        backend.shutdown()
+    ledger = usage.UsageLedger(soft_seconds=1, hard_seconds=2, path=os.path.join(scratch, 'ledger.json'))
+    now = time.time()
+    ledger.record('learner', {'cpu_seconds': 5, 'wall_seconds': 5}, now=now - 25 * 3600)
+    ledger.record('learner', {'cpu_seconds': 0.6, 'wall_seconds': 0.7, 'peak_memory_kb': 2048}, now=now)
+    assert ledger.summary('learner', now=now)['state'] == 'ok'  # yesterday has rolled off
+    ledger.record('learner', {'cpu_seconds': 0.6, 'wall_seconds': 0.7}, now=now)
+    summary = ledger.summary('learner', now=now)
+    assert summary['state'] == 'soft' and summary['runs'] == 2 and summary['peak_memory_kb'] == 2048
+    ledger.record('learner', {'cpu_seconds': 1}, now=now)
+    assert ledger.state('learner') == 'hard'
+    ledger.flush()
+    assert usage.UsageLedger(path=ledger.path).summary('learner', now=now)['runs'] == 3
+    stamp = os.stat(ledger.path).st_mtime_ns
+    ledger.flush()  # nothing new recorded: the file is left alone
+    assert os.stat(ledger.path).st_mtime_ns == stamp
+    r = client.get('/api/usage')
+    assert r.status_code == 200 and r.json['runs'] > 0 and r.json['state'] == 'ok'
+    shared = usage.LEDGER
+    usage.LEDGER = usage.UsageLedger(hard_seconds=1e-9, path=os.path.join(scratch, 'refused.json'))
+    try:
+        client.post('/execute', json={'code': 'print(1)'})
+        r = client.post('/execute', json={'code': 'print(1)'})
+        assert 'quota used up' in r.json['output']
+    finally:
+        usage.LEDGER = shared
+    print("  ✓ CPU, wall time and memory recorded; soft and hard daily quotas apply")
+    
     # Test 5: Playground
     print("\n[TEST 5] Playground")
     r = client.get('/playground')
@@ -72,6 +427,37 @@ def test_app():
         else:
             print(f"  ✓ No duplicate keys in '{path_id}'")
     
+    # Test 7: Metrics Endpoint
+    print("\n[TEST 7] Metrics Endpoint")
+    r = client.get('/metrics')
+    print(f"  ✓ Status: {r.status_code}")
+    assert r.status_code == 200
+    text = r.get_data(as_text=True)
+    assert 'aca_http_request_duration_seconds_bucket{method="GET",route="/playground",le="+Inf"}' in text
+    assert 'aca_execute_outcomes_total{outcome="success"}' in text
+    assert 'aca_execute_outcomes_total{outcome="timeout"} 0' in text
+    assert 'aca_progress_cache_total{result="hit"}' in text
+    print("  ✓ Route latency, execution outcomes and progress cache exported")
+    
+    # Test 8: Request Tracing
+    print("\n[TEST 8] Request Tracing")
+    import tracing
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_file = os.path.join(tmp, 'traces.jsonl')
+        tracing.configure(sample_rate=1.0, path=trace_file)
+        try:
+            client.get('/lesson/fundamentals/hello_world')
+            tracing.flush()
+        finally:
+            tracing.configure(sample_rate=0.0)
+        with open(trace_file) as f:
+            spans = [json.loads(line) for line in f]
+    names = {s['name'] for s in spans}
+    assert {'lesson.lookup', 'progress.is_complete', 'template.render'} <= names
+    root = next(s for s in spans if s['parent_id'] is None)
+    assert all(s['trace_id'] == root['trace_id'] for s in spans)
+    print(f"  ✓ {len(spans)} spans exported under '{root['name']}'")
+    
     print("\n" + "=" * 60)
     print("ALL TESTS PASSED ✅")
     print("=" * 60)
@@ -0,0 +1,198 @@
+"""
+Request Tracing
+Lightweight spans for routes, progress storage, template rendering and code execution
+
+A root span is opened per request and child spans nest under whatever span
+is current in the request's context. Only a sampled fraction of requests
+is traced; for the rest every span() call is a single context lookup.
+Finished traces are appended to a local JSONL file, one span per line.
+
+Configure with the ACA_TRACE_SAMPLE_RATE (0.0-1.0, default 0) and
+ACA_TRACE_FILE environment variables, or call configure().
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+SAMPLE_RATE = float(os.environ.get('ACA_TRACE_SAMPLE_RATE', '0'))
+TRACE_FILE = os.environ.get('ACA_TRACE_FILE', 'traces.jsonl')
+
+_current = contextvars.ContextVar('aca_trace_span', default=None)
+
+
+class Span:
+    """One timed operation; children share their root's finished list"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attrs', 'start', 'wall', 'duration', 'finished')
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.span_id = os.urandom(8).hex()
+        if parent is None:
+            self.trace_id = os.urandom(16).hex()
+            self.parent_id = None
+            self.finished = []
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.finished = parent.finished
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self):
+        self.duration = time.perf_counter() - self.start
+        self.finished.append(self)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.wall, 6),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attrs': self.attrs,
+        }
+
+
+class JsonlExporter:
+    """Appends finished traces to a JSONL file from a background thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                    self._thread.start()
+        self._queue.put(spans)
+
+    def flush(self):
+        """Block until every queued trace is on disk"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    for spans in batch:
+                        for s in spans:
+                            f.write(json.dumps(s.to_dict(), default=str) + '\n')
+            except OSError as e:
+                print(f"Error writing traces: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_exporter = JsonlExporter(TRACE_FILE)
+atexit.register(lambda: _exporter.flush())
+
+
+def configure(sample_rate=None, path=None):
+    """Change the sample rate and/or output file at runtime"""
+    global SAMPLE_RATE, _exporter
+    if sample_rate is not None:
+        SAMPLE_RATE = float(sample_rate)
+    if path is not None and path != _exporter.path:
+        _exporter.flush()
+        _exporter = JsonlExporter(path)
+
+
+def flush():
+    _exporter.flush()
+
+
+def start_trace(name, **attrs):
+    """Open a root span if this trace is sampled; returns a handle for end_trace"""
+    if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+        return None
+    root = Span(name, attrs=attrs)
+    return root, _current.set(root)
+
+
+def end_trace(handle, **attrs):
+    """Close the root span and queue the whole trace for export"""
+    if handle is None:
+        return
+    root, token = handle
+    root.set(**attrs)
+    _current.reset(token)
+    root.end()
+    _exporter.export(root.finished)
+
+
+def start_span(name, **attrs):
+    """Open a child span of the current one; returns a handle for end_span or None"""
+    parent = _current.get()
+    if parent is None:
+        return None
+    child = Span(name, parent, attrs)
+    return child, _current.set(child)
+
+
+def end_span(handle, **attrs):
+    if handle is None:
+        return
+    child, token = handle
+    child.set(**attrs)
+    _current.reset(token)
+    child.end()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Child span of the current span; does nothing outside a sampled trace"""
+    handle = start_span(name, **attrs)
+    if handle is None:
+        yield None
+        return
+    try:
+        yield handle[0]
+    except BaseException as e:
+        handle[0].set(error=type(e).__name__)
+        raise
+    finally:
+        end_span(handle)
+
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current.get()
@@ -0,0 +1,166 @@
+"""
+Usage Accounting
+Per-learner compute use and rolling daily quotas
+
+Every execution reports the CPU time, wall time and peak memory it used
+(the "usage" key of sandbox.run_code's result). The ledger adds them to
+hourly buckets per learner. The last 24 buckets are the rolling day that
+quotas are checked against. Per-day totals are kept for HISTORY_DAYS for
+capacity planning. Both are stored in their own file (ACA_USAGE_FILE,
+default usage_data.json), bound when the ledger is created and written
+every FLUSH_SECONDS, and only when something was recorded.
+
+Quotas count CPU seconds per rolling day:
+- soft (ACA_QUOTA_SOFT_SECONDS, default 300): runs still happen, but are
+  scheduled as batch work, behind learners under quota
+- hard (ACA_QUOTA_HARD_SECONDS, default 900): runs are refused until
+  enough of the day has rolled off
+A limit of 0 turns that check off.
+"""
+
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+USAGE_FILE = os.environ.get('ACA_USAGE_FILE', 'usage_data.json')
+
+SOFT_LIMIT_SECONDS = float(os.environ.get('ACA_QUOTA_SOFT_SECONDS', '300'))
+HARD_LIMIT_SECONDS = float(os.environ.get('ACA_QUOTA_HARD_SECONDS', '900'))
+WINDOW_HOURS = 24
+HISTORY_DAYS = 30
+FLUSH_SECONDS = 5.0
+
+CPU_SECONDS = metrics.Counter('aca_usage_cpu_seconds_total', 'CPU time used by learner code')
+QUOTA_REJECTIONS = metrics.Counter('aca_quota_rejections_total', 'Executions refused over the hard quota')
+
+
+def _empty():
+    return {'cpu_seconds': 0.0, 'wall_seconds': 0.0, 'runs': 0, 'peak_memory_kb': 0}
+
+
+class UsageLedger:
+    """Usage per learner, loaded from and flushed back to its own file"""
+
+    def __init__(self, soft_seconds=SOFT_LIMIT_SECONDS, hard_seconds=HARD_LIMIT_SECONDS,
+                 flush_seconds=FLUSH_SECONDS, path=USAGE_FILE):
+        self.path = path
+        self.soft_seconds = soft_seconds
+        self.hard_seconds = hard_seconds
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._users = None   # loaded on first use
+        self._dirty = False
+        self._thread = None
+
+    def record(self, user, usage, now=None):
+        """Charge one execution; usage may be None (nothing measured)"""
+        now = time.time() if now is None else now
+        usage = usage or {}
+        cpu = float(usage.get('cpu_seconds') or 0)
+        wall = float(usage.get('wall_seconds') or 0)
+        peak = usage.get('peak_memory_kb') or 0
+        hour = str(int(now // 3600))
+        day = datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+        with self._lock:
+            entry = self._load().setdefault(user, {'hours': {}, 'days': {}})
+            for bucket in (entry['hours'].setdefault(hour, _empty()), entry['days'].setdefault(day, _empty())):
+                bucket['cpu_seconds'] += cpu
+                bucket['wall_seconds'] += wall
+                bucket['runs'] += 1
+                bucket['peak_memory_kb'] = max(bucket['peak_memory_kb'], peak)
+            self._prune(entry, now)
+            self._dirty = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_forever, name='usage-flusher', daemon=True)
+                self._thread.start()
+        CPU_SECONDS.inc(amount=cpu)
+
+    def summary(self, user, now=None):
+        """The rolling day's totals, recent days and where the learner stands"""
+        now = time.time() if now is None else now
+        first = int(now // 3600) - WINDOW_HOURS + 1
+        with self._lock:
+            entry = self._load().get(user, {'hours': {}, 'days': {}})
+            window = _empty()
+            for hour, bucket in entry['hours'].items():
+                if int(hour) >= first:
+                    window['cpu_seconds'] += bucket['cpu_seconds']
+                    window['wall_seconds'] += bucket['wall_seconds']
+                    window['runs'] += bucket['runs']
+                    window['peak_memory_kb'] = max(window['peak_memory_kb'], bucket['peak_memory_kb'])
+            days = copy.deepcopy(entry['days'])
+        used = window['cpu_seconds']
+        if self.hard_seconds and used >= self.hard_seconds:
+            state = 'hard'
+        elif self.soft_seconds and used >= self.soft_seconds:
+            state = 'soft'
+        else:
+            state = 'ok'
+        return {
+            'window_hours': WINDOW_HOURS,
+            'cpu_seconds': round(window['cpu_seconds'], 3),
+            'wall_seconds': round(window['wall_seconds'], 3),
+            'runs': window['runs'],
+            'peak_memory_kb': window['peak_memory_kb'] or None,
+            'soft_limit_seconds': self.soft_seconds or None,
+            'hard_limit_seconds': self.hard_seconds or None,
+            'state': state,
+            'days': days,
+        }
+
+    def state(self, user):
+        """'ok', 'soft' or 'hard' for the learner's rolling day"""
+        return self.summary(user)['state']
+
+    def flush(self):
+        """Write pending usage to the ledger's file"""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            for user, entry in list(self._users.items()):
+                self._prune(entry, now)
+                if not entry['hours'] and not entry['days']:
+                    del self._users[user]
+            records = copy.deepcopy(self._users)
+            self._dirty = False
+        try:
+            # Write then rename, so a crash mid-write keeps the last good file
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(records, f)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError as e:
+            print(f"Error saving usage: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def _load(self):
+        if self._users is None:
+            try:
+                with open(self.path) as f:
+                    self._users = json.load(f)
+            except (OSError, ValueError):
+                self._users = {}
+        return self._users
+
+    @staticmethod
+    def _prune(entry, now):
+        first_hour = int(now // 3600) - WINDOW_HOURS + 1
+        first_day = datetime.fromtimestamp(now - HISTORY_DAYS * 86400).strftime('%Y-%m-%d')
+        entry['hours'] = {h: b for h, b in entry['hours'].items() if int(h) >= first_hour}
+        entry['days'] = {d: b for d, b in entry['days'].items() if d > first_day}
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+
+LEDGER = UsageLedger()
+atexit.register(lambda: LEDGER.flush())
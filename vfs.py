@@ -0,0 +1,211 @@
+"""
+Virtual Filesystem
+Per-run in-memory files behind the sandbox's open() and virtual os module
+
+Learner code gets a private, flat set of files that lives only as long as
+the run. Nothing touches the disk, and runs cannot see each other's files.
+Paths are normalised under a virtual root, so "data.txt", "./data.txt"
+and "/data.txt" are the same file and ".." cannot escape. Quotas cap the
+total bytes (stored files plus whatever open handles are buffering), the
+number of files and the number of handles open at once.
+"""
+
+import errno
+import io
+import posixpath
+import types
+import weakref
+
+MAX_BYTES = 1024 * 1024
+MAX_FILES = 64
+MAX_OPEN_FILES = 16
+# What os.path.expanduser('~') reports
+HOME = '/home/learner'
+
+
+class VirtualFS:
+    """name -> bytes, with an open() that behaves like the builtin"""
+
+    def __init__(self, files=None, max_bytes=MAX_BYTES, max_files=MAX_FILES, max_open=MAX_OPEN_FILES):
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_open = max_open
+        self.files = {}
+        # Open handles; one dropped without close() leaves when collected
+        self._handles = weakref.WeakSet()
+        for path, content in (files or {}).items():
+            data = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+            self.files[self.normalize(path)] = data
+
+    @staticmethod
+    def normalize(path):
+        if not isinstance(path, str):
+            raise TypeError(f'expected str path, not {type(path).__name__}')
+        return posixpath.normpath(posixpath.join('/', path)).lstrip('/')
+
+    def used(self):
+        """Bytes held: stored files, with open-for-writing ones counted by their buffers"""
+        writers = [handle for handle in self._handles if handle.writable()]
+        buffered = {handle.name for handle in writers}
+        stored = sum(len(data) for path, data in self.files.items() if path not in buffered)
+        return stored + sum(handle.size() for handle in writers)
+
+    def open(self, file, mode='r', buffering=-1, encoding=None, errors=None, newline=None):
+        path = self.normalize(file)
+        kind = set(mode)
+        if not path or len(kind) != len(mode) or not kind <= set('rwaxbt+') \
+                or len(kind & set('rwax')) != 1 or {'b', 't'} <= kind:
+            raise ValueError(f"invalid mode: '{mode}'")
+        if 'r' in kind and path not in self.files:
+            raise FileNotFoundError(errno.ENOENT, 'No such file or directory', file)
+        if 'x' in kind and path in self.files:
+            raise FileExistsError(errno.EEXIST, 'File exists', file)
+        if path not in self.files and len(self.files) >= self.max_files:
+            raise OSError(errno.ENOSPC, f'Too many files (limit {self.max_files})', file)
+        if len(self._handles) >= self.max_open:
+            raise OSError(errno.EMFILE, f'Too many open files (limit {self.max_open})', file)
+
+        data = b'' if kind & set('wx') else self.files.get(path, b'')
+        readable = 'r' in kind or '+' in kind
+        writable = not kind.isdisjoint('wax+')
+        buffer = VirtualFile(self, path, data, readable, writable)
+        self._handles.add(buffer)
+        if writable:
+            self.files[path] = data
+        if 'a' in kind:
+            buffer.seek(0, io.SEEK_END)
+        if 'b' in kind:
+            return buffer
+        text = io.TextIOWrapper(buffer, encoding=encoding or 'utf-8', errors=errors, newline=newline)
+        text.mode = mode
+        return text
+
+    def _reserve(self, handle, size):
+        """Raise if handle's buffer growing to size bytes would break the quota"""
+        if self.used() - handle.size() + size > self.max_bytes:
+            raise OSError(errno.ENOSPC, f'Virtual disk full (limit {self.max_bytes} bytes)', handle.name)
+
+
+class VirtualFile(io.BytesIO):
+    """Open file handle; writes reach the filesystem on flush and close"""
+
+    def __init__(self, fs, path, data, readable, writable):
+        super().__init__(data)
+        self.name = path
+        self._fs = fs
+        self._readable = readable
+        self._writable = writable
+
+    def readable(self):
+        return self._readable
+
+    def writable(self):
+        return self._writable
+
+    def read(self, size=-1):
+        self._check(self._readable, 'not readable')
+        return super().read(size)
+
+    def read1(self, size=-1):
+        self._check(self._readable, 'not readable')
+        return super().read1(size)
+
+    def readline(self, size=-1):
+        self._check(self._readable, 'not readable')
+        return super().readline(size)
+
+    def readinto(self, b):
+        self._check(self._readable, 'not readable')
+        return super().readinto(b)
+
+    def write(self, b):
+        self._check(self._writable, 'not writable')
+        size = self.size()
+        self._fs._reserve(self, max(size, self.tell() + len(memoryview(b).cast('B'))))
+        return super().write(b)
+
+    def size(self):
+        with self.getbuffer() as view:
+            return len(view)
+
+    def truncate(self, size=None):
+        self._check(self._writable, 'not writable')
+        return super().truncate(size)
+
+    def flush(self):
+        super().flush()
+        if self._writable and not self.closed:
+            self._fs.files[self.name] = self.getvalue()
+
+    def close(self):
+        if not self.closed:
+            try:
+                self.flush()
+            finally:
+                self._fs._handles.discard(self)
+        super().close()
+
+    def _check(self, allowed, message):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        if not allowed:
+            raise io.UnsupportedOperation(message)
+
+
+def os_module(fs):
+    """Stand-in for the os module whose file functions act on fs
+
+    Covers what lessons reach for (os.path.exists, os.listdir, os.remove,
+    os.getcwd, os.sep, ...) without exposing the real process or disk.
+    """
+    path = types.ModuleType('os.path', 'Path helpers for the virtual filesystem')
+    for name in ('join', 'basename', 'dirname', 'split', 'splitext', 'normpath', 'isabs', 'sep'):
+        setattr(path, name, getattr(posixpath, name))
+    path.exists = lambda p: fs.normalize(p) in fs.files or _is_dir(fs, p)
+    path.isfile = lambda p: fs.normalize(p) in fs.files
+    path.isdir = lambda p: _is_dir(fs, p)
+    path.abspath = lambda p: '/' + fs.normalize(p)
+    path.expanduser = lambda p: HOME + p[1:] if p.startswith('~') else p
+
+    def getsize(p):
+        return len(fs.files[_existing(fs, p)])
+
+    path.getsize = getsize
+
+    module = types.ModuleType('os', 'Virtual os module: files live in memory for this run only')
+    module.path = path
+    module.sep = '/'
+    module.linesep = '\n'
+    module.name = 'posix'
+    module.getcwd = lambda: '/'
+
+    def listdir(p='.'):
+        prefix = fs.normalize(p)
+        if not _is_dir(fs, p):
+            raise FileNotFoundError(errno.ENOENT, 'No such file or directory', p)
+        prefix = prefix + '/' if prefix else ''
+        return sorted({name[len(prefix):].split('/')[0] for name in fs.files if name.startswith(prefix)})
+
+    def remove(p):
+        del fs.files[_existing(fs, p)]
+
+    def rename(src, dst):
+        fs.files[fs.normalize(dst)] = fs.files.pop(_existing(fs, src))
+
+    module.listdir = listdir
+    module.remove = module.unlink = remove
+    module.rename = module.replace = rename
+    return module
+
+
+def _existing(fs, p):
+    name = fs.normalize(p)
+    if name not in fs.files:
+        raise FileNotFoundError(errno.ENOENT, 'No such file or directory', p)
+    return name
+
+
+def _is_dir(fs, p):
+    """Directories exist implicitly wherever a file path passes through"""
+    name = fs.normalize(p)
+    return not name or any(f.startswith(name + '/') for f in fs.files)